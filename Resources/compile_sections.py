@@ -0,0 +1,54 @@
+"""
+Compile the AISC shapes spreadsheet into `shapes.npy`, a typed, columnar NumPy
+structured array that StructPy memory-maps at runtime. Missing values ('–')
+become NaN. Run this after updating shapes.xlsx:
+
+	python -m Resources.compile_sections
+"""
+
+import os
+import numpy as np
+import Resources.pickle_sections as pxs
+
+# columns stored as text; every other imperial column is numeric
+textColumns = ['Type', 'EDI_Std_Nomenclature', 'AISC_Manual_Label', 'T_F']
+
+def getPath(file='shapes.npy'):
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), file)
+
+def compileDatabase(data):
+	"""
+	Structured array from the rows of the spreadsheet (header first). The
+	imperial columns are kept, plus the metric names of each shape.
+	"""
+	header, rows = data[0], data[1:]
+	metric = header.index('AISC_Manual_Label', header.index('AISC_Manual_Label') + 1)
+	imperial = header[:metric - 1]
+	
+	fields = []
+	columns = []
+	for col, name in enumerate(imperial):
+		if name in textColumns:
+			width = max(len(row[col]) for row in rows)
+			fields.append((name, f'U{width}'))
+		else:
+			fields.append((name, 'f8'))
+		columns.append(col)
+	for col, name in [(metric - 1, 'EDI_Std_Nomenclature_metric'), (metric, 'AISC_Manual_Label_metric')]:
+		fields.append((name, f'U{max(len(row[col]) for row in rows)}'))
+		columns.append(col)
+	
+	table = np.zeros(len(rows), dtype=fields)
+	for (name, dtype), col in zip(fields, columns):
+		values = [row[col] for row in rows]
+		if dtype == 'f8':
+			values = [np.nan if value in ('–', None) else value for value in values]
+		table[name] = values
+	return table
+
+def main(file='shapes.xlsx'):
+	data, labels = pxs.database2list(file)
+	np.save(getPath(), compileDatabase(data))
+
+if __name__ == '__main__':
+	main()
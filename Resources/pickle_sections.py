@@ -8,10 +8,8 @@ def find(name, path):
 			return os.path.join(root, name)
 			
 def getAbsPath(file):
-	current = os.getcwd()
-	head, tail = os.path.split(current)
-	path = find(file, head)
-	return path
+	"""Path of a file in the Resources package directory"""
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), file)
 
 def loadAISC(file='shapes.xlsx'):
 	path = getAbsPath(file)
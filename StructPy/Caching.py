@@ -1,31 +1,185 @@
 """
-Some functions are 'expensive' (they require quite a bit of compute time), and if the structure hasn't been modified, then these types of functions can be cached and the cache can be cleared if the cached property becomes invalid
-Changing a property to be invalid only requires you to set `self.__cache__{method_name} = None` to clear the cached variable.
+Some functions are 'expensive' (they require quite a bit of compute time), and if the structure hasn't been modified, then these types of functions can be cached and the cache can be cleared if the cached property becomes invalid.
+
+Every model mutation stamps the affected entity with a new epoch from a global counter (see `tick`). A cached property declares what it depends on, either entities or other cached properties, and its value is stored together with the epochs of those dependencies. The value is recomputed only when one of them has changed since.
 """
 
-def cached_property(expensive_function):
+import itertools
+import sys
+from collections import OrderedDict
+
+_counter = itertools.count(1)
+
+def tick():
+    """A new, globally unique epoch"""
+    return next(_counter)
+
+
+class Versioned(object):
+    """
+    Mixin for mutable model inputs (sections, materials). Setting any public
+    attribute stamps the object with a new `_version`, so cached quantities
+    that depend on it become stale.
+    """
+
+    _version = 0
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if not name.startswith('_'):
+            object.__setattr__(self, '_version', tick())
+
+    def epoch(self, name):
+        return self._version
+
+
+def sizeof(value):
+    """Approximate memory held by a cached value, in bytes"""
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if hasattr(value, 'data') and hasattr(value, 'indices'):  # scipy.sparse
+        return int(value.data.nbytes + value.indices.nbytes + getattr(value, 'indptr', value.indices).nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class Cache(object):
     """
-    A decorator function like @property that will cache return a cached quantity if it is available
+    Store for cached properties. Entries are kept in least-recently-used
+    order; when `maxBytes` is set, the oldest entries are evicted once the
+    cached values exceed it. `stats` reports hits, misses and evictions.
     """
+
+    def __init__(self, maxBytes=None):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()  # name: (signature, value, nbytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self):
+        return sum(nbytes for signature, value, nbytes in self.entries.values())
+
     @property
-    def caching_function(self):
-        cacheName = f"__cache__{expensive_function.__name__}"
-        
-		
-        try: # check if the cache has been initialized
-            cacheExists = True
-            cache = getattr(self, cacheName)
-        except AttributeError:
-            cacheExists = False
-            cache = None
-        
-		# Check if the cache is valid (not None), caching is requested, and that it exists
-        if ( cache is not None ) and ( self.withCaching == True ) and (cacheExists == True):
-            return cache
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'nbytes': self.nbytes,
+        }
+
+    def get(self, name, signature):
+        """The cached value, or raise KeyError if it is missing or stale"""
+        try:
+            cachedSignature, value, nbytes = self.entries[name]
+        except KeyError:
+            self.misses += 1
+            raise
+        if cachedSignature != signature:
+            self.misses += 1
+            del self.entries[name]
+            raise KeyError(name)
+        self.hits += 1
+        self.entries.move_to_end(name)
+        return value
+
+    def put(self, name, signature, value):
+        self.entries[name] = (signature, value, sizeof(value))
+        self.entries.move_to_end(name)
+        if self.maxBytes is None:
+            return
+        while self.nbytes > self.maxBytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            if oldest == name:
+                break
+            del self.entries[oldest]
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+
+def getCache(obj):
+    """The Cache of an object, created on first use"""
+    try:
+        return obj.__dict__['cache']
+    except KeyError:
+        cache = obj.__dict__['cache'] = Cache()
+        return cache
+
+
+def signature(obj, depends):
+    """
+    The epochs of everything in `depends`, with cached properties expanded
+    into their own dependencies.
+    """
+    epochs = []
+    for name in depends:
+        attribute = getattr(type(obj), name, None)
+        if isinstance(attribute, CachedProperty):
+            epochs.append(signature(obj, attribute.depends))
         else:
-			#worst case, now we have to compute the quantity
-            computed = expensive_function(self)
-            setattr(self, cacheName, computed)
+            epochs.append(obj.epoch(name))
+    return tuple(epochs)
+
+
+def prime(obj, name, value):
+    """Store an already known value of the cached property `name`, e.g. one read from a file"""
+    attribute = getattr(type(obj), name)
+    getCache(obj).put(name, signature(obj, attribute.depends), value)
+
+
+class CachedProperty(property):
+    """A property whose value is cached until one of its dependencies changes"""
+
+    def __init__(self, expensive_function, depends):
+        self.name = expensive_function.__name__
+        self.depends = depends
+        super().__init__(self.compute, doc=expensive_function.__doc__)
+        self.expensive_function = expensive_function
+
+    def compute(self, obj):
+        if not getattr(obj, 'withCaching', True):
+            return self.expensive_function(obj)
+
+        cache = getCache(obj)
+        key = signature(obj, self.depends)
+        try:
+            return cache.get(self.name, key)
+        except KeyError:
+            # worst case, now we have to compute the quantity
+            computed = self.expensive_function(obj)
+            cache.put(self.name, key, computed)
             return computed
-        
-    return caching_function
\ No newline at end of file
+
+
+def cached_property(*depends):
+    """
+    A decorator like @property that returns a cached quantity while it is
+    still valid. The arguments name what the quantity depends on: entities
+    resolved by the object's `epoch(name)` method, or other cached
+    properties.
+
+    >>> class Square(Versioned):
+    ...     def __init__(self, a):
+    ...         self.a = a
+    ...     @cached_property('a')
+    ...     def area(self):
+    ...         return self.a**2
+    >>> s = Square(2)
+    >>> s.area, s.area
+    (4, 4)
+    >>> s.a = 3
+    >>> s.area
+    9
+    >>> s.cache.stats['hits'], s.cache.stats['misses']
+    (1, 2)
+    """
+    if len(depends) == 1 and callable(depends[0]):
+        # used without arguments: depends on nothing, cached until cleared
+        return CachedProperty(depends[0], ())
+    return lambda expensive_function: CachedProperty(expensive_function, depends)
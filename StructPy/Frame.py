@@ -6,6 +6,7 @@ import numpy as np
 
 class FrameNode(sc.Node):
 	
+	__slots__ = ()
 	DoFNames= ['x', 'y', 'θz']
 	fixities = {   # x,   y,   θ
 		'free'   :  (1.0, 1.0, 1.0),
@@ -26,6 +27,7 @@ class FrameNode(sc.Node):
 
 class FrameMember(sc.Member):
 	
+	__slots__ = ()
 	nDoFPerNode = 3
 	
 	@property
@@ -65,6 +67,124 @@ class FrameMember(sc.Member):
 			[0,  0, 0, 0,  0, 1]
 		])
 	
+	@staticmethod
+	def stackedLocal(vectors, A, E, I):
+		"""
+		Local stiffness and transformation matrices of many frame members at
+		once, each of shape (nMembers, 6, 6). A, E and I may carry leading
+		axes (e.g. one row per candidate design), which k then carries too.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		
+		a = (A*E)/L
+		b = (E*I)/L
+		c = (E*I)/L**2
+		d = (E*I)/L**3
+		a, b, c, d = np.broadcast_arrays(a, b, c, d)
+		
+		k = np.zeros(a.shape + (6, 6))
+		k[..., [0, 3], [0, 3]] = a[..., None]
+		k[..., [0, 3], [3, 0]] = -a[..., None]
+		k[..., [1, 4], [1, 4]] = 12*d[..., None]
+		k[..., [1, 4], [4, 1]] = -12*d[..., None]
+		k[..., [1, 2, 1, 5], [2, 1, 5, 1]] = 6*c[..., None]
+		k[..., [4, 2, 4, 5], [2, 4, 5, 4]] = -6*c[..., None]
+		k[..., [2, 5], [2, 5]] = 4*b[..., None]
+		k[..., [2, 5], [5, 2]] = 2*b[..., None]
+		
+		return k, FrameMember.stackedT(vectors)
+	
+	@staticmethod
+	def stackedT(vectors):
+		"""Local to global transformation matrices of many members, shape (nMembers, 6, 6)"""
+		L = np.linalg.norm(vectors, axis=-1)
+		l = vectors[..., 0]/L
+		m = vectors[..., 1]/L
+		
+		T = np.zeros(L.shape + (6, 6))
+		T[..., [0, 1, 3, 4], [0, 1, 3, 4]] = l[..., None]
+		T[..., [0, 3], [1, 4]] = m[..., None]
+		T[..., [1, 4], [0, 3]] = -m[..., None]
+		T[..., [2, 5], [2, 5]] = 1
+		return T
+	
+	@staticmethod
+	def stackedKglobal(vectors, A, E, I):
+		"""
+		Global stiffness matrices of many frame members at once, shape
+		(nMembers, 6, 6), computed as T^T k T with stacked k and T. A, E
+		and I may carry leading axes (e.g. one row per candidate design),
+		which the result then carries too.
+		"""
+		k, T = FrameMember.stackedLocal(vectors, A, E, I)
+		return np.einsum('...ji,...jk,...kl->...il', T, k, T)
+	
+	@staticmethod
+	def stackedKgeometric(vectors, N):
+		"""
+		Consistent geometric stiffness matrices of many frame members at
+		once, shape (nMembers, 6, 6), for axial forces N (tension positive),
+		transformed to global coordinates like `stackedKglobal`.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		pattern = np.array([
+			[0, 0,   0,   0, 0,   0  ],
+			[0, 36,  3,   0, -36, 3  ],
+			[0, 3,   4,   0, -3,  -1 ],
+			[0, 0,   0,   0, 0,   0  ],
+			[0, -36, -3,  0, 36,  -3 ],
+			[0, 3,   -1,  0, -3,  4  ],
+		], dtype=float)
+		# powers of L in each entry: rotations carry one L each
+		power = np.zeros(6)
+		power[[2, 5]] = 1
+		scale = L[..., None, None]**(power[:, None] + power[None, :])
+		kg = (N/(30*L))[..., None, None] * pattern * scale
+		
+		T = FrameMember.stackedT(vectors)
+		return np.einsum('...ji,...jk,...kl->...il', T, kg, T)
+	
+	@staticmethod
+	def stackedMass(vectors, m, lumped=False):
+		"""
+		Mass matrices of many frame members at once, shape (nMembers, 6, 6),
+		for a mass m per unit length. Lumped mass has no rotary inertia;
+		consistent mass uses the shape functions of the element and is
+		transformed to global coordinates like `stackedKglobal`.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		if lumped:
+			pattern = np.diag([1, 1, 0, 1, 1, 0]) / 2
+			return (m*L)[..., None, None] * pattern
+		
+		pattern = np.array([
+			[140, 0,   0,   70,  0,   0  ],
+			[0,   156, 22,  0,   54,  -13],
+			[0,   22,  4,   0,   13,  -3 ],
+			[70,  0,   0,   140, 0,   0  ],
+			[0,   54,  13,  0,   156, -22],
+			[0,   -13, -3,  0,   -22, 4  ],
+		], dtype=float) / 420
+		power = np.zeros(6)
+		power[[2, 5]] = 1
+		scale = L[..., None, None]**(power[:, None] + power[None, :])
+		local = (m*L)[..., None, None] * pattern * scale
+		
+		T = FrameMember.stackedT(vectors)
+		return np.einsum('...ji,...jk,...kl->...il', T, local, T)
+	
+	@staticmethod
+	def stackedForces(vectors, A, E, I, d, fixedEnd=None):
+		"""
+		Local end forces [N1, V1, M1, N2, V2, M2] of many members at once,
+		k T d, from their global end displacements `d`, shape
+		(nMembers, 6, nCases), plus the local fixed-end forces of element
+		loads, shaped like d. Returns shape (nMembers, 6, nCases).
+		"""
+		k, T = FrameMember.stackedLocal(vectors, A, E, I)
+		forces = np.einsum('mij,mjk,mkc->mic', k, T, d)
+		return forces if fixedEnd is None else forces + fixedEnd
+	
 
 class Frame(sc.Structure, sc.Planar):
 	"""Frame class"""
@@ -1,42 +1,283 @@
-class NodalLoad():
-	
-	def __init__(self, n, x=0, y=0, isGlobal=True):
+"""
+Loads, load cases and load combinations.
+
+A `Loading` collects the nodal and element loads of one load case. Named cases
+(D, L, S, W, E, Lr, ...) are kept in `LoadCases`, which assembles them into one
+sparse (nDoF, nCases) load matrix, so every case is solved with the same
+factorization. Factored combinations are then linear combinations of the case
+results: `Combinations.combine` is a single matrix product with the
+combination coefficients and needs no further solves.
+"""
+
+import itertools
+
+import numpy as np
+
+
+class NodalLoad(object):
+	"""
+	A load on node n: forces x, y and (frames only) moment m, in global
+	coordinates since nodes have no local axes
+	"""
+
+	def __init__(self, n, x=0, y=0, isGlobal=True, m=0):
+		if not isGlobal:
+			raise ValueError('Nodal loads act in global coordinates; resolve local loads into x and y.')
 		self.n = n
 		self.x = x
 		self.y = y
-	
-class ElementLoad():
-	"""Distributed loading"""
-	
-	def __init__(self, m, type, w):
+		self.m = m
+		self.isGlobal = isGlobal
+
+	@property
+	def components(self):
+		return [self.x, self.y, self.m]
+
+
+class ElementLoad(object):
+	"""
+	Distributed loading of intensity w on member m. With isGlobal the load
+	acts in the global y direction, otherwise perpendicular to the member
+	(local y).
+	"""
+
+	types = ['constant']
+
+	def __init__(self, m, w=0, type='constant', isGlobal=False):
+		if type not in ElementLoad.types:
+			raise ValueError(f'Not a valid element load type. Valid types: {ElementLoad.types}')
 		self.m = m
 		self.w = w
 		self.type = type
-		
-	@property
-	def equivalentNodalLoad(self):
-		
-		L = self.element.length
-		w = self.w
-		
-		if self.type == 'constant':
-			return w * L / 2
-		elif self.type == 'point':
-			pass
+		self.isGlobal = isGlobal
+
+
+def fixedEndForces(vectors, wx, wy, nDoFPerNode):
+	"""
+	Local end forces of uniformly loaded members with both ends fixed, shape
+	(nMembers, 2*nDoFPerNode). `vectors` are the start-to-end vectors of the
+	members, wx and wy the axial and transverse load intensities. These are
+	the forces the ends exert on the member, i.e. minus the equivalent nodal
+	loads, and are added to the end forces recovered from the displacements.
+	"""
+	L = np.linalg.norm(vectors, axis=-1)
+	forces = np.zeros((len(L), 2, nDoFPerNode))
+	forces[:, :, 0] = -(wx*L/2)[:, None]
+	forces[:, :, 1] = -(wy*L/2)[:, None]
+	if nDoFPerNode == 3:
+		forces[:, 0, 2] = -wy*L**2/12
+		forces[:, 1, 2] = wy*L**2/12
+	return forces.reshape(len(L), -1)
+
+
+def equivalentNodalLoads(vectors, fixed, nDoFPerNode):
+	"""
+	Equivalent nodal loads in global coordinates, shape (nMembers,
+	2*nDoFPerNode), from the local `fixedEndForces` of the members.
+	"""
+	L = np.linalg.norm(vectors, axis=-1)
+	l = (vectors[:, 0]/L)[:, None]
+	m = (vectors[:, 1]/L)[:, None]
+	local = -fixed.reshape(len(L), 2, nDoFPerNode)
+	loads = local.copy()
+	loads[:, :, 0] = local[:, :, 0]*l - local[:, :, 1]*m
+	loads[:, :, 1] = local[:, :, 0]*m + local[:, :, 1]*l
+	return loads.reshape(len(L), -1)
 
 
 class Loading(object):
-	
+	"""The loads of one load case"""
+
 	def __init__(self):
 		self.nodalLoads = []
 		self.elementLoading = []
+
+	def addNodalLoad(self, n, x=0, y=0, isGlobal=True, m=0):
+		self.nodalLoads.append(NodalLoad(n, x=x, y=y, m=m, isGlobal=isGlobal))
+
+	def addElementLoad(self, m, w=0, type='constant', isGlobal=False):
+		self.elementLoading.append(ElementLoad(m, w=w, type=type, isGlobal=isGlobal))
+
+	def elementLoads(self, structure):
+		"""
+		Loaded members and their local fixed-end forces (see
+		`fixedEndForces`), one row per element load
+		"""
+		nDoFPerNode = structure.__class__.nDoFPerNode
+		members = np.array([load.m for load in self.elementLoading], dtype=np.int64)
+		w = np.array([load.w for load in self.elementLoading], dtype=float)
+		isGlobal = np.array([load.isGlobal for load in self.elementLoading], dtype=bool)
+		
+		vectors = structure.memberVectors[members]
+		unit = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+		# a global y load has components (m, l) along the local axes
+		wx = np.where(isGlobal, w*unit[:, 1], 0)
+		wy = np.where(isGlobal, w*unit[:, 0], w)
+		return members, fixedEndForces(vectors, wx, wy, nDoFPerNode)
+	
+	def fixedEndForces(self, structure):
+		"""Local fixed-end forces of every member, shape (nMembers, 2*nDoFPerNode)"""
+		forces = np.zeros((structure.nMembers, 2*structure.__class__.nDoFPerNode))
+		if self.elementLoading:
+			members, fixed = self.elementLoads(structure)
+			np.add.at(forces, members, fixed)
+		return forces
+	
+	def triplets(self, structure):
+		"""Global DoF and value of every non-zero load component, as arrays"""
+		nDoFPerNode = structure.__class__.nDoFPerNode
+		
+		nodes = np.array([load.n for load in self.nodalLoads], dtype=np.int64)
+		values = np.array([load.components for load in self.nodalLoads], dtype=float).reshape(-1, 3)
+		if values[:, nDoFPerNode:].any():
+			raise ValueError(f'A {structure.__class__.__name__} has no rotational DoFs to carry nodal moments.')
+		values = values[:, :nDoFPerNode]
+		DoF = [(nDoFPerNode*nodes[:, None] + np.arange(nDoFPerNode)).ravel()]
+		values = [values.ravel()]
+		
+		if self.elementLoading:
+			members, fixed = self.elementLoads(structure)
+			DoF.append(structure.DoFMap[members].ravel())
+			values.append(equivalentNodalLoads(structure.memberVectors[members], fixed, nDoFPerNode).ravel())
+		
+		DoF = np.concatenate(DoF)
+		values = np.concatenate(values)
+		loaded = values != 0
+		return DoF[loaded], values[loaded]
+	
+	def vector(self, structure):
+		"""The global load vector of the case"""
+		DoF, values = self.triplets(structure)
+		return np.bincount(DoF, weights=values, minlength=structure.nDoF)
+
+
+class LoadCases(object):
+	"""
+	Named load cases. Cases are solved together, one column of the load
+	matrix each, with the cached factorization of the structure.
+	"""
+
+	def __init__(self):
+		self.cases = {}
+
+	def add(self, name, loading=None):
+		"""Add a load case and return its `Loading`"""
+		self.cases[name] = Loading() if loading is None else loading
+		return self.cases[name]
+
+	def __getitem__(self, name):
+		return self.cases[name]
+
+	def __len__(self):
+		return len(self.cases)
+
+	@property
+	def names(self):
+		return list(self.cases.keys())
+
+	def matrix(self, structure):
+		"""The sparse (nDoF, nCases) load matrix, one column per case"""
+		import scipy.sparse as sp
+		rows, cols, values = [], [], []
+		for i, loading in enumerate(self.cases.values()):
+			DoF, value = loading.triplets(structure)
+			rows.append(DoF)
+			cols.append(np.full(len(DoF), i))
+			values.append(value)
+		return sp.coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+			shape=(structure.nDoF, len(self))).tocsc()
+
+	def solve(self, structure, **options):
+		"""Displacements of every case, shape (nDoF, nCases)"""
+		return structure.directStiffness(self.matrix(structure).toarray(), **options)
 	
-	def addNodalLoad(self, n, x=0, y=0, isGlobal=True):
-		self.nodalLoads.append([
-			NodalLoad(n, x=x, y=y, isGlobal=isGlobal)
-		])
+	def fixedEndForces(self, structure):
+		"""Local fixed-end forces of every case, shape (nMembers, 2*nDoFPerNode, nCases)"""
+		return np.stack([loading.fixedEndForces(structure) for loading in self.cases.values()], axis=-1)
 	
-	def addElementLoad(self, m, x=0, y=0, isGlobal=True):
-		self.elementLoading.append([
-			ElementLoad(m, x=x, y=y, isGlobal=isGlobal)
-		])
+	def memberForces(self, structure, D=None):
+		"""
+		Member forces of every case from its displacements D (by default
+		those of the last solve), including the fixed-end forces of the
+		element loads. The cases are the last axis.
+		"""
+		return structure.memberForces(D, fixedEnd=self.fixedEndForces(structure))
+
+
+# ASCE 7-16 strength design (LRFD) combinations, section 2.3.1. Every term
+# lists its alternatives as (factor, case); a combination is formed for each
+# choice of one alternative per term.
+def roofLoads(factor):
+	return [(factor, 'Lr'), (factor, 'S'), (factor, 'R')]
+
+LRFD = [
+	[[(1.4, 'D')]],
+	[[(1.2, 'D')], [(1.6, 'L')], roofLoads(0.5)],
+	[[(1.2, 'D')], roofLoads(1.6), [(1.0, 'L'), (0.5, 'W')]],
+	[[(1.2, 'D')], [(1.0, 'W')], [(1.0, 'L')], roofLoads(0.5)],
+	[[(0.9, 'D')], [(1.0, 'W')]],
+	[[(1.2, 'D')], [(1.0, 'E')], [(1.0, 'L')], [(0.2, 'S')]],
+	[[(0.9, 'D')], [(1.0, 'E')]],
+]
+
+
+class Combinations(object):
+	"""
+	Load combinations as a coefficient matrix, shape (nCombinations, nCases):
+	combination i is the sum of coefficients[i, j] times case j.
+	"""
+
+	def __init__(self, names, coefficients, cases):
+		self.names = names
+		self.coefficients = np.asarray(coefficients, dtype=float)
+		self.cases = cases
+
+	@classmethod
+	def fromRules(cls, cases, rules=LRFD):
+		"""
+		The combinations of `rules` (by default the ASCE 7 LRFD set) for the
+		named cases. Cases that are not defined are left out, and
+		combinations that end up identical are kept once.
+		"""
+		cases = list(cases)
+		names, rows = [], []
+		for rule in rules:
+			terms = []
+			for alternatives in rule:
+				present = [(factor, name) for factor, name in alternatives if name in cases]
+				if present:
+					terms.append(present)
+			for choice in itertools.product(*terms):
+				row = np.zeros(len(cases))
+				for factor, name in choice:
+					row[cases.index(name)] += factor
+				if row.any() and not any(np.array_equal(row, other) for other in rows):
+					rows.append(row)
+					names.append(' + '.join([f'{factor:g}{name}' for factor, name in choice]))
+		return cls(names, np.reshape(rows, (len(rows), len(cases))), cases)
+
+	def __len__(self):
+		return len(self.names)
+
+	def combine(self, results):
+		"""
+		Results of every combination from the results of the cases, which
+		are the last axis of `results` (e.g. displacements (nDoF, nCases) or
+		member forces). No further solves are needed.
+		"""
+		return np.asarray(results) @ self.coefficients.T
+
+	def envelope(self, results):
+		"""
+		Maximum and minimum over all combinations of case `results`, with
+		the index of the governing combination of each (see `names`).
+		"""
+		combined = self.combine(results)
+		maxCombination = combined.argmax(axis=-1)
+		minCombination = combined.argmin(axis=-1)
+		return {
+			'max': np.take_along_axis(combined, maxCombination[..., None], axis=-1)[..., 0],
+			'min': np.take_along_axis(combined, minCombination[..., None], axis=-1)[..., 0],
+			'maxCombination': maxCombination,
+			'minCombination': minCombination,
+		}
@@ -7,6 +7,7 @@ import logging
 
 class TrussNode(sc.Node):
 
+	__slots__ = ()
 	DoFNames = ['x', 'y']
 	fixities = {   # x, y
 		'free'   :  (1.0, 1.0),
@@ -27,6 +28,7 @@ class TrussMember(sc.Member):
 	Define Truss Member class. Only allows axial loading.
 	"""
 	
+	__slots__ = ()
 	nDoFPerNode = 2
 	
 	@property
@@ -50,6 +52,59 @@ class TrussMember(sc.Member):
 			[0, 0, l, m]
 		])
 	
+	@staticmethod
+	def stackedKglobal(vectors, A, E, I=None):
+		"""
+		Global stiffness matrices of many truss members at once, shape
+		(nMembers, 4, 4). Each matrix is the outer product (A*E/L) u u^T with
+		u = [-l, -m, l, m]. A and E may carry leading axes (e.g. one row per
+		candidate design), which the result then carries too.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		u = np.concatenate([-vectors, vectors], axis=-1) / L[..., None]
+		return (A*E/L)[..., None, None] * np.einsum('...i,...j->...ij', u, u)
+	
+	@staticmethod
+	def stackedKgeometric(vectors, N):
+		"""
+		Geometric stiffness matrices of many truss members at once, shape
+		(nMembers, 4, 4), for axial forces N (tension positive):
+		(N/L) [[G, -G], [-G, G]] with G = I - e e^T.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		e = vectors / L[..., None]
+		G = np.eye(2) - np.einsum('...i,...j->...ij', e, e)
+		kg = np.concatenate([np.concatenate([G, -G], axis=-1), np.concatenate([-G, G], axis=-1)], axis=-2)
+		return (N/L)[..., None, None] * kg
+	
+	@staticmethod
+	def stackedMass(vectors, m, lumped=False):
+		"""
+		Mass matrices of many truss members at once, shape (nMembers, 4, 4),
+		for a mass m per unit length. Bar mass matrices are the same in
+		every direction, so they need no transformation.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		if lumped:
+			pattern = np.eye(4) / 2
+		else:
+			pattern = np.kron([[2, 1], [1, 2]], np.eye(2)) / 6
+		return (m*L)[..., None, None] * pattern
+	
+	@staticmethod
+	def stackedForces(vectors, A, E, I, d, fixedEnd=None):
+		"""
+		Axial forces of many truss members at once, (A*E/L) [l, m, -l, -m] d,
+		from their global end displacements `d`, shape (nMembers, 4, nCases).
+		Returns shape (nMembers, nCases), with the sign convention of `axial`.
+		The axial fixed-end force at the start of element loads, `fixedEnd`
+		shaped like d, is added, so the result is the force at the start.
+		"""
+		L = np.linalg.norm(vectors, axis=-1)
+		u = np.concatenate([vectors, -vectors], axis=-1) / L[..., None]
+		forces = (A*E/L)[:, None] * np.einsum('mi,mic->mc', u, d)
+		return forces if fixedEnd is None else forces + fixedEnd[:, 0]
+	
 	@property
 	def axial(self):
 		l = self.unVec[0]
@@ -58,8 +113,8 @@ class TrussMember(sc.Member):
 		A = self.cross.A
 		E = self.material.E
 		L = self.length
-		deformation = self.SN.deformation + self.EN.deformation
-		return (A*E)/L * np.array([l, m, -l, -m]) @ np.array(deformation).T
+		deformation = np.concatenate([self.SN.deformation, self.EN.deformation])
+		return (A*E)/L * np.array([l, m, -l, -m]) @ deformation
 
 class Truss(sc.Structure, sc.Planar):	
 	"""This class builds on the structure class adding truss methods"""
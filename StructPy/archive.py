@@ -0,0 +1,163 @@
+"""
+Saving and reopening structures as a single uncompressed .npz file.
+
+The archive holds the node and member tables, the sections and materials in
+use, and, when they have been computed, the stiffness matrix, its
+factorization and the displacements. Because the members of an uncompressed
+zip are stored as they are, `load` memory-maps every large array straight
+from the file instead of reading it. Reopening a solved model therefore
+costs little more than reading the file's directory, and data is paged in
+only when it is used.
+
+Sections and materials are pickled, so only open archives you trust.
+"""
+
+import importlib
+import json
+import pickle
+import struct
+import zipfile
+
+import numpy as np
+
+from StructPy.Caching import getCache, prime, signature, tick
+from StructPy.solvers import Factorization
+
+FORMAT = 1
+MAPPED_BYTES = 1 << 16  # smaller arrays are read rather than memory-mapped
+
+
+def save(s1, path, matrices=True):
+	"""
+	Write a structure to `path`. With `matrices`, K and its factorization are
+	saved too if they have been computed and are still valid.
+	"""
+	meta = {
+		'format': FORMAT,
+		'type': f'{s1.__class__.__module__}.{s1.__class__.__qualname__}',
+		'withCaching': s1.withCaching,
+		'sparse': s1.sparse,
+		'renumber': s1.renumber,
+		'cacheLimit': s1.cache.maxBytes,
+	}
+	objects = (s1.defaultcross, s1.defaultmaterial, s1.members.sections, s1.members.materials)
+	arrays = {
+		'meta': np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+		'objects': np.frombuffer(pickle.dumps(objects), dtype=np.uint8),
+	}
+	for name in s1.nodes.columns:
+		arrays[f'nodes/{name}'] = getattr(s1.nodes, name)
+	for name in s1.members.columns:
+		arrays[f'members/{name}'] = getattr(s1.members, name)
+	if s1.nodes.deformation is not None:
+		arrays['deformation'] = s1.nodes.deformation
+	if s1.nodes.reaction is not None:
+		arrays['reaction'] = s1.nodes.reaction
+	if getattr(s1, 'loading', None) is not None:
+		arrays['loading'] = s1.loading
+
+	if matrices and s1.withCaching:
+		K = _valid(s1, 'K')
+		if K is not None and s1.sparse:
+			K = K.tocsc()
+			arrays.update({'K/data': K.data, 'K/indices': K.indices, 'K/indptr': K.indptr})
+		elif K is not None:
+			arrays['K'] = K
+		factorization = _valid(s1, 'factorization')
+		if factorization is not None:
+			for name, value in factorization.arrays().items():
+				arrays[f'factorization/{name}'] = value
+
+	with open(path, 'wb') as f:
+		np.savez(f, **arrays)
+
+
+def _valid(s1, name):
+	"""The cached value of a cached property if it is still valid, else None"""
+	cache = getCache(s1)
+	try:
+		return cache.get(name, signature(s1, getattr(type(s1), name).depends))
+	except KeyError:
+		return None
+
+
+def mapArrays(path):
+	"""
+	The arrays of an uncompressed .npz file, memory-mapped (copy on write)
+	where they are large enough to be worth it.
+	"""
+	arrays = {}
+	with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+		for info in archive.infolist():
+			name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+			if info.compress_type != zipfile.ZIP_STORED:
+				with archive.open(info) as member:
+					arrays[name] = np.lib.format.read_array(member)
+				continue
+			# skip the local file header to the start of the .npy data
+			f.seek(info.header_offset)
+			header = f.read(30)
+			nameLength, extraLength = struct.unpack('<HH', header[26:30])
+			f.seek(info.header_offset + 30 + nameLength + extraLength)
+			version = np.lib.format.read_magic(f)
+			if version == (1, 0):
+				shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+			else:
+				shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+			size = int(np.prod(shape)) * dtype.itemsize
+			if size < MAPPED_BYTES or dtype.hasobject:
+				arrays[name] = np.frombuffer(f.read(size), dtype=dtype).reshape(shape, order='F' if fortran else 'C').copy()
+			else:
+				arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=f.tell(), shape=shape,
+					order='F' if fortran else 'C')
+	return arrays
+
+
+def load(path, StructureType=None):
+	"""
+	Reopen a structure written by `save`. Its cached K and factorization are
+	restored, so it can be solved again without being refactorized.
+	"""
+	arrays = mapArrays(path)
+	meta = json.loads(arrays['meta'].tobytes().decode())
+	if meta['format'] > FORMAT:
+		raise ValueError(f'{path} was written by a newer version of StructPy.')
+
+	module, name = meta['type'].rsplit('.', 1)
+	storedType = getattr(importlib.import_module(module), name)
+	if StructureType is None or not hasattr(StructureType, 'NodeType'):
+		StructureType = storedType
+	elif not issubclass(storedType, StructureType):
+		raise ValueError(f'{path} holds a {storedType.__name__}, not a {StructureType.__name__}.')
+
+	cross, material, sections, materials = pickle.loads(arrays['objects'].tobytes())
+	for item in [cross, material] + sections + materials:
+		# versions from the process that saved them mean nothing here
+		object.__setattr__(item, '_version', tick())
+
+	s1 = StructureType(cross=cross, material=material, withCaching=meta['withCaching'],
+		sparse=meta['sparse'], renumber=meta['renumber'], cacheLimit=meta['cacheLimit'])
+	s1.nodes.assign(**{name: arrays[f'nodes/{name}'] for name in s1.nodes.columns})
+	s1.members.assign(**{name: arrays[f'members/{name}'] for name in s1.members.columns})
+	for cross in sections:
+		s1.members.sectionId(cross)
+	for material in materials:
+		s1.members.materialId(material)
+	s1.nodes.deformation = arrays.get('deformation')
+	s1.nodes.reaction = arrays.get('reaction')
+	if s1.nodes.reaction is not None:
+		s1.reactions = s1.nodes.reaction.reshape((s1.nDoF,) + s1.nodes.reaction.shape[2:])
+	if 'loading' in arrays:
+		s1.loading = arrays['loading']
+
+	if 'K/data' in arrays:
+		import scipy.sparse as sp
+		prime(s1, 'K', sp.csc_matrix((arrays['K/data'], arrays['K/indices'], arrays['K/indptr']),
+			shape=(s1.nDoF, s1.nDoF)))
+	elif 'K' in arrays:
+		prime(s1, 'K', arrays['K'])
+	factorization = {name[len('factorization/'):]: value for name, value in arrays.items()
+		if name.startswith('factorization/')}
+	if factorization:
+		prime(s1, 'factorization', Factorization.fromArrays(factorization))
+	return s1
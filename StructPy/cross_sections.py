@@ -1,14 +1,23 @@
 import numpy as np
 import math
-import matplotlib.pyplot as plt
-import openpyxl as xl
-import Resources.pickle_sections as pxs
+from StructPy import shapes
+from StructPy.Caching import Versioned, cached_property
 
 
-class Section():
+class Section(Versioned):
 	"""This will define the cross section class that all other cross sections
 	will adopt from. All other cross sections that adopt from the `Section`
-	class will inherit the classes methods and properties."""
+	class will inherit the classes methods and properties.
+	
+	The parametric sections (IBeam, Rectangle, Circle, HSS, hollowCircle)
+	also accept NumPy arrays for their dimensions. They then describe a
+	family of sections, and every property is evaluated for the whole family
+	in one broadcasted expression:
+	
+	>>> family = Rectangle(b=np.array([1., 2., 3.]), h=2)
+	>>> family.A
+	array([2., 4., 6.])
+	"""
 
 	def __init__(self):
 		pass
@@ -18,11 +27,11 @@ class Section():
 		"""Describes the distribution of cross sectional area about it's centroid.
 		The radius if the area was condensed into a circle without changing the
 		moment of inertia."""
-		return math.sqrt(self.Ix / self.A)
+		return np.sqrt(self.Ix / self.A)
 		
 	@property
 	def ry(self):
-		return math.sqrt(self.Iy / self.A)
+		return np.sqrt(self.Iy / self.A)
 		
 	@property
 	def J(self):
@@ -37,6 +46,7 @@ class Section():
 		
 	def plot(self):
 		"""Plot the figure"""
+		import matplotlib.pyplot as plt
 		plt.figure()
 		plt.grid(True)
 		plt.axis('equal')
@@ -46,44 +56,67 @@ class Section():
 		plt.show()
 		
 		
-class AISC():
+class AISC(Versioned):
+	"""
+	An AISC shape. The section is a light view onto one row of the shared
+	shape catalog; every column of the database (W, A, Ix, Zx, bf, tw, ...)
+	is available as an attribute and can be overridden by assigning to it.
+	"""
 	
-	def __init__(self, AISCName):		
-		#the database is preserved in the pickleditem.txt file for speed
-		try:
-			data, labels = pxs.unPickleObject()
-			self.data = data
-			self.labels = labels
-		except:
-			pxs.main()
-			data, labels = pxs.unPickleObject('pickleditem.txt')
-			self.data = data
-			self.labels = labels
-		
-		#index is the row of the shape.
+	def __init__(self, AISCName):
+		self.row_number = shapes.catalog().find(AISCName)
+	
+	@classmethod
+	def fromRow(cls, row):
+		"""The shape in a row of the catalog"""
+		shape = cls.__new__(cls)
+		shape.row_number = int(row)
+		return shape
+	
+	@classmethod
+	def query(cls, type=None, **ranges):
+		"""
+		Shapes of `type` ('W', 'HSS', 'L', ...) whose properties lie in the
+		given ranges, lightest first. A range is a minimum or a (min, max)
+		pair, e.g. AISC.query('W', Zx=120, ry=(2.0, None)).
+		"""
+		return [cls.fromRow(row) for row in shapes.catalog().query(type, **ranges)]
+	
+	@classmethod
+	def lightest(cls, type=None, **ranges):
+		"""
+		The lightest adequate shape, or None. Bounds may be arrays with one
+		entry per member; a list of shapes (None where nothing fits) is
+		returned for those.
+		"""
+		rows = shapes.catalog().lightest(type, **ranges)
+		if np.ndim(rows) == 0:
+			return None if rows < 0 else cls.fromRow(rows)
+		return [None if row < 0 else cls.fromRow(row) for row in np.ravel(rows)]
+	
+	def __getattr__(self, name):
+		if name.startswith('_'):
+			raise AttributeError(name)
 		try:
-			index = [i for i, s in enumerate(labels) if AISCName in s]
-			self.row_number = index[0]
-		except IndexError:
-			raise ValueError("Shape ID not a valid AISC Shape")
-		
-		#assign values from the database as properties
-		def item(col):
-			return self.data[self.row_number][col]
-		self.W = item(4)
-		self.A = item(5)
-		self.Ix = item(38)
-		self.Iy = item(42)
-		self.rx = item(41)
-		self.ry = item(45)
-		self.Zx = item(39)
-		self.Zy = item(43)
-		self.Sx = item(40)
-		self.Sy = item(44)
-		self.rts = item(74)
-		self.ho = item(75)
-		self.J = item(49)
-		
+			return shapes.catalog().value(self.row_number, name)
+		except KeyError:
+			raise AttributeError(f"'AISC' shape has no property '{name}'")
+	
+	def __getitem__(self, column):
+		"""Database columns that are not valid identifiers, e.g. shape['b/t']"""
+		return shapes.catalog().value(self.row_number, column)
+	
+	@property
+	def name(self):
+		return shapes.catalog().names[self.row_number]
+	
+	@property
+	def data(self):
+		return shapes.catalog().table
+	
+	@property
+	def labels(self):
+		return shapes.catalog().names
 						
 	def printProperties(self):
 		"""Print all AISC shape properties in an easy to read table."""
@@ -91,24 +124,180 @@ class AISC():
 		data = self.data
 		
 		print('Here are the properties')
-		print('Section %s in row %i' % (data[row_num][2], row_num))
+		print('Section %s in row %i' % (self.name, row_num))
 		
 		for col in range(4, 84):
-			colname = data[0][col]
-			val = data[row_num][col]
-			if val == '–':
+			colname = data.dtype.names[col]
+			val = data[colname][row_num]
+			if np.isnan(val):
 				pass
 			else:
 				print('{0:<3} | {1:<8} | {2:>8}'.format(col, colname, str(val)))		
 		
 		
+def polygonProperties(x, y):
+	"""
+	Area, first and second moments of polygons about the origin from their
+	vertices, by Green's theorem (shoelace sums over the edges).
+	
+	x, y have shape (..., nPoints); leading axes are a batch of outlines, so
+	thousands of shapes are evaluated at once. The outline closes itself and
+	may also repeat its first point. Outlines with fewer vertices can be
+	padded by repeating their last vertex, since zero-length edges add
+	nothing. Either orientation is accepted.
+	
+	Returns a dict of arrays: A, Sx and Sy (first moments about the x and y
+	axes), Ixx, Iyy and Ixy.
+	
+	>>> p = polygonProperties([0, 2, 2, 0], [0, 0, 1, 1])
+	>>> float(p['A']), float(p['Sx']), float(p['Ixx'])
+	(2.0, 1.0, 0.6666666666666666)
+	"""
+	x0 = np.asarray(x, dtype=float)
+	y0 = np.asarray(y, dtype=float)
+	x1 = np.roll(x0, -1, axis=-1)
+	y1 = np.roll(y0, -1, axis=-1)
+	cross = x0*y1 - x1*y0
+	
+	A = cross.sum(axis=-1) / 2
+	sign = np.where(A < 0, -1.0, 1.0)  # clockwise outlines count as positive
+	return {
+		'A':   sign * A,
+		'Sx':  sign * ((y0 + y1)*cross).sum(axis=-1) / 6,
+		'Sy':  sign * ((x0 + x1)*cross).sum(axis=-1) / 6,
+		'Ixx': sign * ((y0**2 + y0*y1 + y1**2)*cross).sum(axis=-1) / 12,
+		'Iyy': sign * ((x0**2 + x0*x1 + x1**2)*cross).sum(axis=-1) / 12,
+		'Ixy': sign * ((x0*y1 + 2*x0*y0 + 2*x1*y1 + x1*y0)*cross).sum(axis=-1) / 24,
+	}
+
+
+def polygonAbove(x, y, c):
+	"""
+	Area and first moment about the line y = c of the part of a polygon above
+	that line. `c` may be an array of cut heights, evaluated at once.
+	
+	Each edge is clipped to y >= c and integrated with Green's theorem; the
+	pieces of the boundary that run along the cut add nothing because
+	y - c vanishes there.
+	"""
+	x0 = np.asarray(x, dtype=float)
+	y0 = np.asarray(y, dtype=float)
+	x1 = np.roll(x0, -1)
+	y1 = np.roll(y0, -1)
+	c = np.asarray(c, dtype=float)[..., None]
+	
+	# clip every edge to the half plane y >= c
+	dy = np.where(y1 == y0, 1, y1 - y0)
+	t = np.clip((c - y0) / dy, 0, 1)
+	xc = x0 + t*(x1 - x0)
+	startAbove = y0 >= c
+	endAbove = y1 >= c
+	xa = np.where(startAbove, x0, xc)
+	xb = np.where(endAbove, x1, xc)
+	ea = np.where(startAbove, y0 - c, 0)  # height above the cut
+	eb = np.where(endAbove, y1 - c, 0)
+	keep = startAbove | endAbove
+	dx = np.where(keep, xb - xa, 0)
+	
+	sign = 1.0 if (x0*y1 - x1*y0).sum() >= 0 else -1.0
+	area = -sign * ((ea + eb)/2 * dx).sum(axis=-1)
+	moment = -sign * ((ea**2 + ea*eb + eb**2)/6 * dx).sum(axis=-1)
+	return area, moment
+
+
 class customSection(Section):
+	"""
+	A section defined by its outline, the points (xpts, ypts), with optional
+	holes given as a list of (xpts, ypts) outlines. The geometric properties
+	are computed from the polygons and cached until the points are
+	reassigned.
+	
+	>>> angle = customSection([0, 4, 4, 1, 1, 0], [0, 0, 1, 1, 4, 4])
+	>>> float(angle.A), float(angle.xbar), float(angle.Ixy)
+	(7.0, 1.3571428571428572, -5.142857142857144)
+	"""
 	
-	def __init__(self, xpts, ypts):
+	def __init__(self, xpts, ypts, holes=None):
+		self.name = 'Custom'
 		self.xpts = xpts
 		self.ypts = ypts
+		self.holes = [] if holes is None else holes
+	
+	@cached_property('xpts', 'ypts', 'holes')
+	def moments(self):
+		"""Moments about the origin, holes subtracted"""
+		moments = polygonProperties(self.xpts, self.ypts)
+		for xpts, ypts in self.holes:
+			hole = polygonProperties(xpts, ypts)
+			for key in moments:
+				moments[key] = moments[key] - hole[key]
+		return moments
+	
+	@property
+	def A(self):
+		return self.moments['A']
+	
+	@property
+	def xbar(self):
+		return self.moments['Sy'] / self.A
+	
+	@property
+	def ybar(self):
+		return self.moments['Sx'] / self.A
+	
+	@property
+	def Ix(self):
+		"""Moment of inertia about the centroidal x axis"""
+		return self.moments['Ixx'] - self.A * self.ybar**2
+	
+	@property
+	def Iy(self):
+		"""Moment of inertia about the centroidal y axis"""
+		return self.moments['Iyy'] - self.A * self.xbar**2
+	
+	@property
+	def Ixy(self):
+		"""Centroidal product of inertia"""
+		return self.moments['Ixy'] - self.A * self.xbar * self.ybar
+	
+	@property
+	def principal(self):
+		"""Principal moments of inertia (I1 >= I2) and the angle of the I1 axis"""
+		mean = (self.Ix + self.Iy) / 2
+		radius = np.hypot((self.Ix - self.Iy) / 2, self.Ixy)
+		theta = np.arctan2(-2 * self.Ixy, self.Ix - self.Iy) / 2
+		return mean + radius, mean - radius, theta
+	
+	@property
+	def Sx(self):
+		"""Elastic section modulus about x, governed by the farthest fibre"""
+		c = max(np.max(self.ypts) - self.ybar, self.ybar - np.min(self.ypts))
+		return self.Ix / c
+	
+	@property
+	def Sy(self):
+		"""Elastic section modulus about y, governed by the farthest fibre"""
+		c = max(np.max(self.xpts) - self.xbar, self.xbar - np.min(self.xpts))
+		return self.Iy / c
+	
+	@property
+	def Qmax(self):
+		return self.Q(0)
+	
+	def Q(self, zeta):
+		"""
+		First moment about the centroidal x axis of the area above
+		y = ybar + zeta. `zeta` may be an array.
+		"""
+		c = self.ybar + np.asarray(zeta, dtype=float)
+		area, moment = polygonAbove(self.xpts, self.ypts, c)
+		for xpts, ypts in self.holes:
+			holeArea, holeMoment = polygonAbove(xpts, ypts, c)
+			area = area - holeArea
+			moment = moment - holeMoment
+		return moment + (c - self.ybar) * area
 		
-		
+
 
 class generalSection(Section):
 	"""This is a general cross section. Define custom properties
@@ -144,17 +333,14 @@ class IBeam(Section):
 		
 	@property
 	def Iy(self):
-		var1 = 2/12 * self.tf**3 * self.b
+		var1 = 2/12 * self.tf * self.b**3
 		var2 = 1/12 * self.tw**3 * self.d
 		return var1 + var2
 
 	@property
 	def Sx(self):
 		"""Section Modulus"""
-		var1 = self.b * self.h**2
-		var2 = self.h**3 / (self.h + 2 * self.tf)
-		var3 = self.b - self.tw
-		return 1 / 6 * (var1 - var2 * var3)
+		return self.Ix / (self.d / 2 + self.tf)
 
 	@property
 	def Qmax(self):
@@ -212,7 +398,7 @@ class Rectangle(Section):
 		return (self.b * self.h**2) / 6
 
 	def Q(self, zeta):
-		Q = 1 / 4 * self.h * (1 / 4 * self.h**2 - zeta**2)
+		Q = 1 / 2 * self.b * (1 / 4 * self.h**2 - zeta**2)
 		return Q
 		
 	@property
@@ -237,15 +423,22 @@ class Circle(Section):
 
 	@property
 	def A(self):
-		return math.pi * self.r**2
+		return np.pi * self.r**2
 
 	@property
 	def Ix(self):
-		return math.pi * self.r**4 / 4
+		return np.pi * self.r**4 / 4
+
+	@property
+	def Iy(self):
+		return self.Ix
 
 	@property
 	def Sx(self):
-		return (math.pi * self.d**3) / 32
+		return (np.pi * self.d**3) / 32
+
+	def Q(self, zeta):
+		return 2 / 3 * (self.r**2 - zeta**2)**1.5
 		
 	@property
 	def xpts(self):
@@ -276,7 +469,7 @@ class HSS(Section):
 
 	@property
 	def A(self):
-		return self.B * self.H - self.b - self.h
+		return self.B * self.H - self.b * self.h
 
 	@property
 	def Ix(self):
@@ -307,35 +500,40 @@ class hollowCircle(Section):
 
 	@property
 	def do(self):
-		return 2 * ro
+		return 2 * self.ro
 
 	@property
 	def di(self):
-		return 2 * ri
+		return 2 * self.ri
 
 	@property
 	def A(self):
-		return math.pi * (self.ro**2 - self.ri**2)
+		return np.pi * (self.ro**2 - self.ri**2)
 
 	@property
 	def Ix(self):
-		return math.pi / 4 * (self.ro**4 - self.ri**4)
+		return np.pi / 4 * (self.ro**4 - self.ri**4)
+
+	@property
+	def Iy(self):
+		return self.Ix
 
 	@property
 	def Sx(self):
-		var1 = math.pi * (self.do**4 - self.di**4)
+		var1 = np.pi * (self.do**4 - self.di**4)
 		var2 = 32 * self.do
 		return var1 / var2
 
 
 class Triangle(Section):
 	def __init__(self, b, h):
+		self.name = 'Triangle'
 		self.b = b
 		self.h = h
 
-		@property
-		def A(self):
-			return 1 / 2 * self.b * self.h
+	@property
+	def A(self):
+		return 1 / 2 * self.b * self.h
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""
+Linear transient analysis by Newmark-β / HHT-α time integration.
+
+The time step is constant, so the effective stiffness is the same at every
+step: it is factorized once, and a step then costs two sparse mat-vecs and a
+pair of triangular solves. Results are written every `decimation` steps
+straight into preallocated arrays, or into .npy files memory-mapped with
+`np.lib.format.open_memmap` when an output directory is given, so long records
+never accumulate in memory. Member forces are recovered in batches of records.
+"""
+
+import os
+
+import numpy as np
+
+from StructPy.solvers import Factorization
+
+CHUNK = 64  # records whose member forces are recovered together
+
+
+def rayleigh(zeta, f1, f2):
+	"""
+	Coefficients (a0, a1) of Rayleigh damping C = a0 M + a1 K that gives the
+	damping ratio zeta at the frequencies f1 and f2 (cycles per unit time).
+
+	>>> a0, a1 = rayleigh(0.05, 1, 1)
+	>>> float(a0/(4*np.pi) + a1*np.pi)
+	0.05
+	"""
+	w1, w2 = 2*np.pi*f1, 2*np.pi*f2
+	return 2*zeta*w1*w2/(w1 + w2), 2*zeta/(w1 + w2)
+
+
+def newmarkParameters(alpha):
+	"""
+	β and γ of the HHT-α method. alpha = 0 is the average acceleration
+	(trapezoidal) Newmark method; alpha down to -1/3 adds numerical damping
+	of the high modes while staying second-order accurate.
+	"""
+	if not -1/3 <= alpha <= 0:
+		raise ValueError('HHT alpha must be between -1/3 and 0.')
+	return (1 - alpha)**2/4, (1 - 2*alpha)/2
+
+
+def output(directory, name, shape):
+	"""A zeroed array for results, memory-mapped to <directory>/<name>.npy if a directory is given"""
+	if directory is None:
+		return np.zeros(shape)
+	return np.lib.format.open_memmap(os.path.join(directory, f'{name}.npy'), mode='w+', dtype=float, shape=shape)
+
+
+def integrate(structure, M, C, P, history, dt, alpha=0, decimation=1, forces=True, directory=None):
+	"""
+	Integrate M a + C v + K u = P history(t) from rest, on the free DoFs.
+
+	M, C: reduced mass matrix and Rayleigh coefficients (a0, a1) of C
+	P: reduced load patterns, shape (nFree, nPatterns)
+	history: multiplier of each pattern at every step, (nPatterns, nSteps + 1)
+
+	Returns the time of every record, the global displacements
+	(nRecords, nDoF) and, with `forces`, the member forces (nRecords,
+	nMembers, ...) as `memberForces` gives them.
+	"""
+	beta, gamma = newmarkParameters(alpha)
+	if decimation < 1:
+		raise ValueError('The decimation must be a positive number of steps.')
+	K = structure.reducedK
+	a0, a1 = C
+	nSteps = history.shape[1] - 1
+	nRecords = nSteps//decimation + 1
+
+	# Keff du = rhs at every step, with du the displacement increment
+	Keff = (1/(beta*dt**2) + (1 + alpha)*gamma/(beta*dt)*a0)*M + (1 + alpha)*(1 + gamma/(beta*dt)*a1)*K
+	factorization = Factorization(Keff, order=structure.DoFOrder)
+
+	n = K.shape[0]
+	u, v, a = np.zeros(n), np.zeros(n), np.zeros(n)
+	F = P @ history[:, 0]
+	if F.any():
+		initial = Factorization(M)
+		if len(initial.singularDoF()):
+			raise ValueError('A record that starts with loads on DoFs without mass has no initial acceleration; start it from zero.')
+		a = initial.solve(F)
+
+	time = dt*decimation*np.arange(nRecords)
+	displacements = output(directory, 'displacements', (nRecords, structure.nDoF))
+	memberForces = None
+	free = structure.freeDoF
+	buffer = np.zeros((min(CHUNK, nRecords), n))
+
+	def flush(start, count):
+		D = np.zeros((structure.nDoF, count))
+		D[free] = buffer[:count].T
+		displacements[start:start + count] = D.T
+		if forces:
+			nonlocal memberForces
+			f = np.moveaxis(structure.memberForces(D), -1, 0)
+			if memberForces is None:
+				memberForces = output(directory, 'memberForces', (nRecords,) + f.shape[1:])
+			memberForces[start:start + count] = f
+
+	record, buffered = 0, 1  # the state at rest is the first record
+	for step in range(1, nSteps + 1):
+		Fnext = P @ history[:, step]
+		# C w = a0 M w + a1 K w, so the damping terms fold into the M and K products
+		w = ((1 + alpha)*(1 - gamma/beta) - alpha)*v + (1 + alpha)*dt*(1 - gamma/(2*beta))*a
+		rhs = (1 + alpha)*Fnext - alpha*F \
+			+ M @ (v/(beta*dt) + (1/(2*beta) - 1)*a - a0*w) \
+			- K @ (u + a1*w)
+		du = factorization.solve(rhs)
+		aNext = du/(beta*dt**2) - v/(beta*dt) - (1/(2*beta) - 1)*a
+		v = v + dt*((1 - gamma)*a + gamma*aNext)
+		u = u + du
+		a, F = aNext, Fnext
+
+		if step % decimation == 0:
+			buffer[buffered] = u
+			buffered += 1
+			if buffered == len(buffer):
+				flush(record, buffered)
+				record, buffered = record + buffered, 0
+	if buffered:
+		flush(record, buffered)
+
+	if directory is not None:
+		displacements.flush()
+		if memberForces is not None:
+			memberForces.flush()
+	return time, displacements, memberForces
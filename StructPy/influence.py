@@ -0,0 +1,113 @@
+"""
+Influence lines and moving loads.
+
+The influence lines of a structure along a load path come from a single
+multi-RHS solve: one unit load per position along the path, all solved with
+the cached factorization. A moving load (a train of axles) is then swept along
+the lines by interpolation, for every lead-axle position at once, without any
+further solves.
+"""
+
+import numpy as np
+
+
+def pathPoints(structure, path):
+	"""
+	(start node, end node, fraction) of every point of a load path, given as
+	node numbers or (member, fraction) pairs, plus the distance of each point
+	along the path.
+	"""
+	SN, EN, t = [], [], []
+	for point in path:
+		if np.ndim(point) == 0:
+			SN.append(int(point))
+			EN.append(int(point))
+			t.append(0.0)
+		else:
+			member, fraction = point
+			if not 0 <= fraction <= 1:
+				raise ValueError('Positions along a member must be fractions between 0 and 1.')
+			SN.append(structure.connectivity[member, 0])
+			EN.append(structure.connectivity[member, 1])
+			t.append(float(fraction))
+	SN, EN, t = np.array(SN, dtype=np.int64), np.array(EN, dtype=np.int64), np.array(t)
+
+	xy = structure.coordinates
+	points = (1 - t)[:, None]*xy[SN] + t[:, None]*xy[EN]
+	x = np.concatenate([[0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))])
+	if np.any(np.diff(x) <= 0):
+		raise ValueError('The points of a load path must be distinct.')
+	return SN, EN, t, x
+
+
+class InfluenceLines(object):
+	"""
+	Influence lines along a load path. `x` is the distance of each load
+	position along the path and `lines` maps a response ('members',
+	'reactions', 'displacements') to its values for a unit load at every
+	position, with the positions as the last axis.
+	"""
+
+	def __init__(self, x, lines):
+		self.x = x
+		self.lines = lines
+
+	def __getitem__(self, name):
+		return self.lines[name]
+
+	def leadPositions(self, offsets):
+		"""
+		Lead axle positions at which some axle is over a point of the path.
+		The lines are linear in between, so their extremes under a moving
+		load occur at these positions.
+		"""
+		return np.unique(self.x[:, None] + offsets[None, :])
+
+	def sweep(self, loads, offsets, lead):
+		"""
+		Responses to a train of axle `loads`, the axles `offsets` behind the
+		lead axle, for every lead position in `lead`. Axles off the path
+		carry no load. Returns {response: values}, lead positions last.
+		"""
+		loads = np.asarray(loads, dtype=float)
+		offsets = np.asarray(offsets, dtype=float)
+		x = self.x
+
+		positions = lead[:, None] - offsets[None, :]  # (nLead, nAxles)
+		i = np.clip(np.searchsorted(x, positions, side='right') - 1, 0, len(x) - 2)
+		w = (positions - x[i]) / (x[i + 1] - x[i])
+		on = (positions >= x[0]) & (positions <= x[-1])
+		w0 = np.where(on, 1 - w, 0) * loads
+		w1 = np.where(on, w, 0) * loads
+
+		responses = {}
+		for name, line in self.lines.items():
+			flat = line.reshape(-1, len(x))
+			values = np.einsum('rla,la->rl', flat[:, i], w0) + np.einsum('rla,la->rl', flat[:, i + 1], w1)
+			responses[name] = values.reshape(line.shape[:-1] + (len(lead),))
+		return responses
+
+	def movingLoad(self, loads, offsets=0):
+		"""
+		Max/min envelopes of every response under a moving train of axle
+		`loads`, with `offsets` the distance of each axle behind the lead
+		axle. Returns {response: {'max', 'min', 'maxAt', 'minAt'}} where
+		maxAt/minAt are the governing lead axle positions along the path.
+		"""
+		loads = np.atleast_1d(np.asarray(loads, dtype=float))
+		offsets = np.broadcast_to(np.asarray(offsets, dtype=float), loads.shape)
+		if np.any(offsets < 0):
+			raise ValueError('Axle offsets are distances behind the lead axle and cannot be negative.')
+
+		lead = self.leadPositions(offsets)
+		envelopes = {}
+		for name, values in self.sweep(loads, offsets, lead).items():
+			maxAt = values.argmax(axis=-1)
+			minAt = values.argmin(axis=-1)
+			envelopes[name] = {
+				'max': values.max(axis=-1),
+				'min': values.min(axis=-1),
+				'maxAt': lead[maxAt],
+				'minAt': lead[minAt],
+			}
+		return envelopes
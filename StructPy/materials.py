@@ -1,11 +1,28 @@
+from StructPy.Caching import Versioned
 
-class Steel():
+g = 386.4 #in/s^2
+
+
+class Steel(Versioned):
+	
+	density = 0.2836 #lb/in^3, weight density
 	
 	def __init__(self, E=29000, Fy=50, Fu=85, cost=0):
 		self.E = E
 		self.Fy = Fy
 		self.Fu = Fu
 		self.cost = cost
+	
+	@property
+	def massDensity(self):
+		"""
+		Mass per unit volume in kip*s^2/in^4, consistent with E in ksi and
+		lengths in inches
+		
+		>>> round(A992().massDensity, 10)
+		7.34e-07
+		"""
+		return self.density / 1000 / g
 		
 		
 class A992(Steel):
@@ -27,12 +44,15 @@ class A36(Steel):
 		self.poisson = 0.26
 		
 		
-class Custom():
+class Custom(Versioned):
 	"""
 	>>> ma1 = Custom(E=29000, fy=60)
 	"""
-	def __init__(self, E=None, fy=None):
+	def __init__(self, E=None, fy=None, massDensity=None):
 		"""
+		`massDensity` is mass per unit volume in units consistent with E
+		(kip*s^2/in^4 for ksi and inches).
+		
 		>>> ma1 = Custom(E=29000, fy=60)
 		>>> ma1.E
 		29000
@@ -41,3 +61,4 @@ class Custom():
 		"""
 		self.E = E
 		self.fy = fy
+		self.massDensity = massDensity
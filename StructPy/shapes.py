@@ -0,0 +1,169 @@
+"""
+The AISC shapes database, loaded once per process and shared by every
+`cross_sections.AISC` section.
+"""
+
+import os
+import re
+
+import numpy as np
+import Resources
+
+_catalog = None
+
+def catalog():
+	"""The process-wide shape catalog, loaded on first use"""
+	global _catalog
+	if _catalog is None:
+		_catalog = ShapeCatalog.load()
+	return _catalog
+
+
+def normalize(name):
+	"""Canonical spelling of a shape name: upper case, no blanks, 'X' separators"""
+	return re.sub(r'\s+', '', str(name)).upper().replace('×', 'X')
+
+
+class ShapeCatalog(object):
+	"""
+	The AISC shapes database as a columnar structured array, one row per
+	shape, with an exact-name hash index. Shapes can also be found by their
+	EDI or metric names and by any spelling that normalizes to one of those
+	(e.g. 'w21x44').
+	"""
+
+	def __init__(self, table):
+		self.table = table
+		self.columns = table.dtype.names
+		self.names = table['AISC_Manual_Label'].tolist()
+		self.index = {name: i for i, name in enumerate(self.names)}
+
+		self.aliases = {}
+		for column in ['AISC_Manual_Label', 'EDI_Std_Nomenclature', 'AISC_Manual_Label_metric']:
+			for i, name in enumerate(table[column].tolist()):
+				self.aliases.setdefault(normalize(name), i)
+
+		self._sorted = {}  # column: (rows sorted by the column, sorted values)
+		self._types = {}   # shape type: rows of that type, lightest first
+
+	@classmethod
+	def load(cls, path=None):
+		"""
+		Memory-map the compiled database (`Resources/shapes.npy`). It is
+		compiled from shapes.xlsx first if it is missing.
+		"""
+		if path is None:
+			path = os.path.join(os.path.dirname(Resources.__file__), 'shapes.npy')
+		if not os.path.exists(path):
+			from Resources import compile_sections
+			compile_sections.main()
+		return cls(np.load(path, mmap_mode='r'))
+
+	def __len__(self):
+		return len(self.table)
+
+	def __contains__(self, name):
+		return name in self.index or normalize(name) in self.aliases
+
+	def find(self, name):
+		"""Row number of a shape"""
+		try:
+			return self.index[name]
+		except KeyError:
+			pass
+		try:
+			return self.aliases[normalize(name)]
+		except KeyError:
+			raise ValueError("Shape ID not a valid AISC Shape")
+
+	def value(self, row, column):
+		"""Value of a column (e.g. 'A', 'Ix') for the shape in `row`, NaN if not tabulated"""
+		return self.table[column][row].item()
+
+	def sortedIndex(self, column):
+		"""Rows ordered by a column (untabulated values last) and the sorted values"""
+		try:
+			return self._sorted[column]
+		except KeyError:
+			values = np.asarray(self.table[column])
+			order = np.argsort(values, kind='stable')
+			self._sorted[column] = (order, values[order])
+			return self._sorted[column]
+
+	def rowsOfType(self, type=None):
+		"""Rows of one shape type (e.g. 'W', 'HSS'), or of a list of types, lightest first"""
+		key = tuple(type) if isinstance(type, (list, tuple)) else type
+		try:
+			return self._types[key]
+		except KeyError:
+			pass
+		order, W = self.sortedIndex('W')
+		if type is not None:
+			types = np.asarray(self.table['Type'])[order]
+			order = order[np.isin(types, [type] if isinstance(type, str) else list(type))]
+		self._types[key] = order
+		return order
+
+	@staticmethod
+	def bounds(bound):
+		"""(min, max) of a range given as a minimum or a (min, max) pair, None for open ends"""
+		lower, upper = bound if isinstance(bound, tuple) else (bound, None)
+		lower = -np.inf if lower is None else lower
+		upper = np.inf if upper is None else upper
+		return lower, upper
+
+	def query(self, type=None, **ranges):
+		"""
+		Rows of the shapes of `type` whose properties lie in the given ranges,
+		lightest (by W) first. A range is a minimum or a (min, max) pair:
+
+		>>> c = catalog()
+		>>> [c.names[i] for i in c.query('W', Zx=120, ry=(2.0, None))[:3]]
+		['W16X67', 'W14X74', 'W18X76']
+		"""
+		rows = self.rowsOfType(type)
+		keep = np.ones(len(self), dtype=bool)
+		for column, bound in ranges.items():
+			lower, upper = self.bounds(bound)
+			order, values = self.sortedIndex(column)
+			start = np.searchsorted(values, lower, side='left')
+			stop = np.searchsorted(values, upper, side='right')
+			inRange = np.zeros(len(self), dtype=bool)
+			inRange[order[start:stop]] = True
+			keep &= inRange
+		return rows[keep[rows]]
+
+	def lightest(self, type=None, chunk=4096, **ranges):
+		"""
+		Row of the lightest shape of `type` whose properties lie in the ranges
+		(see `query`), or -1 if none does. Bounds may also be arrays, one per
+		query, in which case an array of rows is returned:
+
+		>>> c = catalog()
+		>>> c.names[c.lightest('W', Zx=120, ry=2.0)]
+		'W16X67'
+		>>> [c.names[i] for i in c.lightest('W', Zx=[50, 120, 500])]
+		['W16X31', 'W24X55', 'W36X135']
+		"""
+		rows = self.rowsOfType(type)
+		limits = []
+		shape = ()
+		for column, bound in ranges.items():
+			lower, upper = [np.asarray(b, dtype=float) for b in self.bounds(bound)]
+			shape = np.broadcast_shapes(shape, lower.shape, upper.shape)
+			limits.append((np.asarray(self.table[column])[rows], lower, upper))
+		
+		nQueries = int(np.prod(shape))
+		found = np.full(nQueries, -1)
+		for start in range(0, nQueries, chunk):
+			stop = min(start + chunk, nQueries)
+			fits = np.ones((stop - start, len(rows)), dtype=bool)
+			for values, lower, upper in limits:
+				lower = np.broadcast_to(lower, shape).ravel()[start:stop, None]
+				upper = np.broadcast_to(upper, shape).ravel()[start:stop, None]
+				fits &= (lower <= values) & (values <= upper)
+			first = fits.argmax(axis=1)
+			hit = fits[np.arange(stop - start), first]
+			found[start:stop][hit] = rows[first[hit]]
+		
+		return found.reshape(shape) if shape else int(found[0])
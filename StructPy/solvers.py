@@ -0,0 +1,414 @@
+"""
+Linear solvers for the reduced stiffness matrix.
+
+Factorizing `reducedK` is the expensive part of a solve, so the factorization is
+built once, cached on the structure and reused for every load case.
+
+scipy is imported inside the functions that need it, so importing StructPy
+stays cheap for processes that never solve.
+"""
+
+import numpy as np
+
+
+SHIFT = 1e-13  # relative diagonal shift that locates the mechanism of an exactly singular K
+
+
+class UnstableStructureError(ValueError):
+	"""Raised when the stiffness matrix is singular. `DoF` lists the offending DoFs."""
+
+	def __init__(self, message, DoF=()):
+		super().__init__(message)
+		self.DoF = DoF
+
+
+def bandwidth(K):
+	"""Half bandwidth of a dense matrix, max |i - j| over its non-zeros"""
+	rows, cols = np.nonzero(K)
+	return int(abs(rows - cols).max()) if len(rows) else 0
+
+
+def reverseCuthillMcKee(connectivity, nNodes):
+	"""
+	Node ordering that reduces the bandwidth of the stiffness matrix, from
+	the (SN, EN) connectivity of the members. `order[i]` is the node that is
+	numbered i-th.
+	"""
+	import scipy.sparse as sp
+	from scipy.sparse.csgraph import reverse_cuthill_mckee
+	SN, EN = np.asarray(connectivity).T
+	ones = np.ones(len(SN))
+	graph = sp.coo_matrix((ones, (SN, EN)), shape=(nNodes, nNodes))
+	return reverse_cuthill_mckee((graph + graph.T).tocsr(), symmetric_mode=True)
+
+
+class Factorization(object):
+	"""
+	Factorization of a symmetric positive definite stiffness matrix. Dense
+	matrices use a LAPACK Cholesky factorization, sparse matrices use SuperLU
+	in symmetric mode (diagonal pivoting with a fill-reducing ordering).
+
+	If an `order` (a permutation of the DoFs, e.g. from reverse Cuthill-McKee)
+	is given, K is factorized in that order: dense matrices switch to banded
+	Cholesky storage and SuperLU keeps the order instead of its own. Inputs
+	and results of `solve` stay in the original order. With `permuted`, K
+	is given already in that order (e.g. as assembled by a `Pattern`).
+
+	The pivots of the factorization are kept in `pivots`, relative to the
+	diagonal of K and in the original DoF order. A pivot that vanishes means
+	the DoF adds no stiffness beyond the DoFs eliminated before it, i.e. a
+	mechanism, so stability is checked without any extra work.
+	"""
+
+	def __init__(self, K, order=None, permuted=False):
+		import scipy.sparse as sp
+		self.n = K.shape[0]
+		self.sparse = sp.issparse(K)
+		self.order = order
+		self.failed = False
+		
+		if order is not None and not permuted:
+			K = K[order, :][:, order] if self.sparse else K[np.ix_(order, order)]
+		diagonal = abs(K.diagonal())
+		diagonal[diagonal == 0] = 1
+		
+		if self.sparse:
+			pivots = self._factorSparse(K)
+		elif order is not None:
+			pivots = self._factorBanded(K)
+		else:
+			pivots = self._factorDense(K)
+		pivots = pivots / diagonal
+		
+		if order is not None:
+			self.pivots = np.empty(self.n)
+			self.pivots[order] = pivots
+		else:
+			self.pivots = pivots
+
+	def _factorSparse(self, K):
+		import scipy.sparse as sp
+		import scipy.sparse.linalg as spla
+		permc_spec = 'MMD_AT_PLUS_A' if self.order is None else 'NATURAL'
+		try:
+			self.lu = spla.splu(sp.csc_matrix(K), permc_spec=permc_spec,
+				diag_pivot_thresh=0, options=dict(SymmetricMode=True))
+		except RuntimeError:
+			# exactly singular and SuperLU does not say where: refactorize
+			# with a tiny shift of the diagonal, which leaves the pivots of
+			# the mechanism at about the size of the shift. The shifted
+			# factors only locate it and are not kept for solves.
+			self.failed = True
+			diagonal = abs(K.diagonal())
+			shift = SHIFT*np.where(diagonal > 0, diagonal, diagonal.max(initial=1))
+			try:
+				lu = spla.splu(sp.csc_matrix(K + sp.diags(shift)), permc_spec=permc_spec,
+					diag_pivot_thresh=0, options=dict(SymmetricMode=True))
+			except RuntimeError:
+				return np.zeros(self.n)
+			return abs(lu.U.diagonal())[lu.perm_c]
+		# U holds the pivots in factorization order; perm_c maps each DoF there
+		return abs(self.lu.U.diagonal())[self.lu.perm_c]
+
+	def _factorDense(self, K):
+		import scipy.linalg as la
+		c, info = la.lapack.dpotrf(K, lower=False, clean=True)
+		self.cholesky = (c, False)
+		return self._checkPivots(np.diag(c)**2, info)
+
+	def _factorBanded(self, K):
+		import scipy.linalg as la
+		u = bandwidth(K)
+		ab = np.zeros((u + 1, self.n))
+		for k in range(u + 1):
+			ab[u - k, k:] = np.diagonal(K, k)
+		c, info = la.lapack.dpbtrf(ab, lower=False)
+		self.banded = (c, False)
+		return self._checkPivots(c[u]**2, info)
+
+	def _checkPivots(self, pivots, info):
+		if info > 0:
+			# the leading minor of order `info` is not positive definite
+			self.failed = True
+			pivots[info-1:] = np.nan
+			pivots[info-1] = 0
+		return pivots
+
+	@property
+	def nbytes(self):
+		"""Memory held by the factors"""
+		if self.sparse:
+			return 12*(self.lu.L.nnz + self.lu.U.nnz) if not self.failed else 0
+		elif self.order is not None:
+			return self.banded[0].nbytes
+		return self.cholesky[0].nbytes
+
+	def arrays(self):
+		"""The factorization as a dict of arrays, see `fromArrays`"""
+		arrays = {'n': self.n, 'sparse': self.sparse, 'failed': self.failed, 'pivots': self.pivots}
+		if self.order is not None:
+			arrays['order'] = self.order
+		if self.failed:
+			return arrays
+		if self.sparse:
+			for name in ['L', 'U']:
+				factor = getattr(self.lu, name).tocsr()
+				arrays.update({f'{name}_data': factor.data, f'{name}_indices': factor.indices, f'{name}_indptr': factor.indptr})
+			arrays.update(perm_r=self.lu.perm_r, perm_c=self.lu.perm_c)
+		elif self.order is not None:
+			arrays['banded'] = self.banded[0]
+		else:
+			arrays['cholesky'] = self.cholesky[0]
+		return arrays
+
+	@classmethod
+	def fromArrays(cls, arrays):
+		"""
+		A factorization rebuilt from `arrays()`, e.g. as read from a file. The
+		arrays are used as they are, so memory-mapped factors stay on disk
+		until they are needed.
+		"""
+		self = cls.__new__(cls)
+		self.n = int(arrays['n'])
+		self.sparse = bool(arrays['sparse'])
+		self.failed = bool(arrays['failed'])
+		self.pivots = arrays['pivots']
+		self.order = arrays.get('order')
+		if self.failed:
+			pass
+		elif self.sparse:
+			import scipy.sparse as sp
+			L, U = [sp.csr_matrix((arrays[f'{name}_data'], arrays[f'{name}_indices'], arrays[f'{name}_indptr']),
+				shape=(self.n, self.n)) for name in ['L', 'U']]
+			self.lu = TriangularFactors(L, U, arrays['perm_r'], arrays['perm_c'])
+		elif self.order is not None:
+			self.banded = (arrays['banded'], False)
+		else:
+			self.cholesky = (arrays['cholesky'], False)
+		return self
+
+	@property
+	def positiveDefinite(self):
+		"""
+		Whether K is positive definite. SuperLU pivots on the diagonal of a
+		symmetric K, so its pivots have the signs of K's eigenvalues.
+		"""
+		if self.failed:
+			return False
+		if self.sparse:
+			return bool((self.lu.U.diagonal() > 0).all())
+		return True
+
+	def factorOrder(self):
+		"""
+		The order in which the DoFs were factorized, as `order` above, or
+		None for the natural order. Other matrices with the same pattern can
+		be factorized in it with `permuted=True`.
+		"""
+		if self.failed:
+			raise UnstableStructureError('Cannot reuse the ordering of a singular stiffness matrix.', self.singularDoF())
+		if self.order is None and self.sparse:
+			return np.argsort(self.lu.perm_c)
+		return self.order
+
+	def singularDoF(self, tol=1e-10):
+		"""Indices of the DoFs whose relative pivot is below `tol`"""
+		return np.flatnonzero(self.pivots <= tol)
+
+	def solve(self, b):
+		"""
+		Solve K x = b. `b` may be a vector or an (n, nCases) matrix, in which
+		case every column is solved with the same factorization.
+		"""
+		import scipy.linalg as la
+		if self.failed:
+			raise UnstableStructureError('Cannot solve with a singular stiffness matrix.', self.singularDoF())
+		b = np.asarray(b, dtype=float)
+		if self.order is not None:
+			b = b[self.order]
+		
+		if self.sparse:
+			x = self.lu.solve(b)
+		elif self.order is not None:
+			x = la.cho_solve_banded(self.banded, b, check_finite=False)
+		else:
+			x = la.cho_solve(self.cholesky, b, check_finite=False)
+		
+		if self.order is not None:
+			x[self.order] = x.copy()
+		return x
+
+
+class Pattern(object):
+	"""
+	The reduced matrix of a fixed set of COO triplet positions, e.g. those of
+	`Structure.scatter`. Restrained DoFs are dropped, the rest are put in
+	`order` and duplicates are located once, so matrices with new values at
+	the same positions (K + Kg during nonlinear iterations) are assembled by
+	a single bincount into the same CSC structure, ready for a `Factorization`
+	with `permuted=True` that keeps the same ordering.
+	"""
+
+	def __init__(self, rows, cols, freeDoF, order=None, sparse=True):
+		n = int(np.count_nonzero(freeDoF))
+		self.n = n
+		self.sparse = sparse
+		self.order = order
+		# position of every global DoF in the reduced, ordered matrix
+		reduced = np.full(len(freeDoF), -1)
+		reduced[freeDoF] = np.arange(n)
+		if order is not None:
+			position = np.empty(n, dtype=np.int64)
+			position[order] = np.arange(n)
+			reduced[freeDoF] = position
+		r, c = reduced[rows], reduced[cols]
+		self.kept = (r >= 0) & (c >= 0)
+		key = c[self.kept]*n + r[self.kept]  # column major, as CSC
+		
+		if sparse:
+			unique, self.map = np.unique(key, return_inverse=True)
+			self.indices = unique % n
+			self.indptr = np.searchsorted(unique // n, np.arange(n + 1))
+			self.nnz = len(unique)
+		else:
+			self.map = key
+			self.nnz = n*n
+	
+	def assemble(self, values):
+		"""The reduced matrix with `values` (one per triplet) summed into place"""
+		data = np.bincount(self.map, weights=values[self.kept], minlength=self.nnz)
+		if self.sparse:
+			import scipy.sparse as sp
+			return sp.csc_matrix((data, self.indices, self.indptr), shape=(self.n, self.n))
+		return data.reshape(self.n, self.n).T
+	
+	def dot(self, A, x):
+		"""A x for an assembled matrix A, with x and the result in the original order"""
+		if self.order is None:
+			return A @ x
+		y = np.empty_like(x)
+		y[self.order] = A @ x[self.order]
+		return y
+
+
+class TriangularFactors(object):
+	"""
+	Stored SuperLU factors, Pr K Pc = L U, solved with two sparse triangular
+	solves. Stands in for the SuperLU object, which cannot be rebuilt from
+	its factors.
+	"""
+
+	def __init__(self, L, U, perm_r, perm_c):
+		self.L = L
+		self.U = U
+		self.perm_r = perm_r
+		self.perm_c = perm_c
+
+	def solve(self, b):
+		import scipy.sparse.linalg as spla
+		y = np.empty_like(b)
+		y[self.perm_r] = b
+		y = spla.spsolve_triangular(self.L, y, lower=True, unit_diagonal=True)
+		y = spla.spsolve_triangular(self.U, y, lower=False)
+		return y[self.perm_c]
+
+
+class ElementOperator(object):
+	"""
+	Matrix-free reducedK. Products K x are computed from the stacked global
+	element matrices and the DoF map, so K is never formed.
+	"""
+
+	def __init__(self, kglobals, DoFMap, freeDoF):
+		n = int(np.count_nonzero(freeDoF))
+		self.shape = (n, n)
+		# index of every global DoF in reducedK; restrained DoFs point at an
+		# extra zero entry appended to x
+		reduced = np.full(len(freeDoF), n)
+		reduced[freeDoF] = np.arange(n)
+		self.kglobals = kglobals
+		self.DoF = reduced[DoFMap]
+
+	def dot(self, x):
+		x = np.append(np.ravel(x), 0)
+		y = np.einsum('mij,mj->mi', self.kglobals, x[self.DoF])
+		return np.bincount(self.DoF.ravel(), weights=y.ravel(), minlength=self.shape[0] + 1)[:-1]
+
+	__matmul__ = dot
+
+	def diagonal(self):
+		d = np.einsum('mii->mi', self.kglobals)
+		return np.bincount(self.DoF.ravel(), weights=d.ravel(), minlength=self.shape[0] + 1)[:-1]
+
+
+def buildPreconditioner(K, kind='jacobi'):
+	"""
+	Approximate inverse of K for `pcg`, as a function r -> M r. `kind` is
+	'jacobi' (diagonal scaling, works matrix-free), 'ic' (incomplete
+	factorization, needs an assembled matrix) or 'amg' (smoothed aggregation
+	multigrid from pyamg).
+	"""
+	if kind is None:
+		return None
+	elif kind == 'jacobi':
+		d = K.diagonal()
+		return lambda r: r/d
+	elif kind == 'ic':
+		import scipy.sparse as sp
+		import scipy.sparse.linalg as spla
+		if isinstance(K, ElementOperator):
+			raise ValueError('Incomplete Cholesky needs an assembled stiffness matrix.')
+		ilu = spla.spilu(sp.csc_matrix(K), drop_tol=1e-4, fill_factor=10, diag_pivot_thresh=0,
+			options=dict(SymmetricMode=True))
+		return ilu.solve
+	elif kind == 'amg':
+		import scipy.sparse as sp
+		try:
+			import pyamg
+		except ImportError:
+			raise ImportError('The library pyamg is required for multigrid preconditioning.')
+		return pyamg.smoothed_aggregation_solver(sp.csr_matrix(K)).aspreconditioner().matvec
+	raise ValueError("Not a valid preconditioner. Valid types: None, 'jacobi', 'ic', 'amg'")
+
+
+def pcg(K, b, M=None, x0=None, tol=1e-8, maxiter=None):
+	"""
+	Preconditioned conjugate gradient for K x = b. `K` is anything with a
+	`dot` method (dense, sparse or an ElementOperator) and `M` a function
+	applying the preconditioner; `x0` warm-starts the iteration. Returns x
+	and a dict with the iteration count, the relative residual history and
+	whether ||K x - b|| <= tol ||b|| was reached.
+	"""
+	b = np.asarray(b, dtype=float)
+	x = np.zeros_like(b) if x0 is None else np.array(x0, dtype=float)
+	maxiter = 10*len(b) if maxiter is None else maxiter
+	applyM = (lambda r: r) if M is None else M
+	
+	bnorm = np.linalg.norm(b) or 1
+	r = b - K.dot(x)
+	history = [np.linalg.norm(r)/bnorm]
+	z = applyM(r)
+	p = z.copy()
+	rz = r @ z
+	
+	iterations = 0
+	while history[-1] > tol and iterations < maxiter:
+		Kp = K.dot(p)
+		alpha = rz / (p @ Kp)
+		x += alpha*p
+		r -= alpha*Kp
+		z = applyM(r)
+		rzNew = r @ z
+		p = z + (rzNew/rz)*p
+		rz = rzNew
+		iterations += 1
+		history.append(np.linalg.norm(r)/bnorm)
+	
+	info = {
+		'iterations': iterations,
+		'residual': history[-1],
+		'history': np.array(history),
+		'tol': tol,
+		'converged': history[-1] <= tol,
+	}
+	return x, info
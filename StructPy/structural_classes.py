@@ -1,51 +1,144 @@
 from StructPy import cross_sections as xs
 from StructPy import materials as ma
-import matplotlib.pyplot as plt
 import numpy as np
-from StructPy.Caching import cached_property
-
-try:
-	import yaml
-except ImportError:
-	raise ImportError('The library pyyaml is required to read a yaml file.')
-
-def flatten(items):
-	return sum(items, [])	
+import logging
+import time
+from StructPy.Caching import Cache, cached_property
+from StructPy.tables import NodeTable, MemberTable
+from StructPy.solvers import Factorization, Pattern, UnstableStructureError, bandwidth, reverseCuthillMcKee
+from StructPy.solvers import ElementOperator, buildPreconditioner, pcg
+
+def assemble(rows, cols, values, n, sparse=False):
+	"""
+	Sum (row, col, value) triplets into an n x n matrix. Duplicate entries are
+	added together, so the triplets of every member can be passed at once.
+	"""
+	if sparse:
+		import scipy.sparse as sp
+		return sp.coo_matrix((values, (rows, cols)), shape=(n, n)).tocsc()
+	return np.bincount(rows*n + cols, weights=values, minlength=n*n).reshape(n, n)
 
 class Node(object):
-
-	def __init__(self, x, y, n=None, cost=0, fixity='free'):
-		self.x = x
-		self.y = y
-		self.cost = cost
+	"""
+	A view onto one row of a `NodeTable`. Nodes are created with
+	`Structure.addNode`; the view keeps no data of its own.
+	"""
+	
+	__slots__ = ('table', 'n')
+	
+	def __init__(self, table, n):
+		self.table = table
 		self.n = n
-		self.fixity = fixity
+	
+	@property
+	def x(self):
+		return self.table.xy[self.n, 0]
+	
+	@x.setter
+	def x(self, value):
+		self.table.xy[self.n, 0] = value
+		self.table.touch('xy')
+	
+	@property
+	def y(self):
+		return self.table.xy[self.n, 1]
+	
+	@y.setter
+	def y(self, value):
+		self.table.xy[self.n, 1] = value
+		self.table.touch('xy')
+	
+	@property
+	def cost(self):
+		return self.table.cost[self.n]
+	
+	@cost.setter
+	def cost(self, value):
+		self.table.cost[self.n] = value
+		self.table.touch('cost')
+	
+	@property
+	def fixity(self):
+		return self.table.fixityNames[self.table.fixity[self.n]]
+	
+	@fixity.setter
+	def fixity(self, value):
+		self.table.fixity[self.n] = self.table.fixityCode(value)
+		self.table.touch('fixity')
 	
 	@property
 	def BC(self):
-		try:
-			return self.__class__.fixities[self.fixity]
-		except KeyError:
-			validKeys = ', '.join([str(key) for key in self.__class__.fixities.keys()])
-			raise ValueError(f'Not a valid nodal support type. Valid types: {validKeys}')
+		return self.table.fixityBC[self.table.fixity[self.n]]
+	
+	@property
+	def deformation(self):
+		if self.table.deformation is None:
+			raise AttributeError('The structure has not been solved yet.')
+		return self.table.deformation[self.n]
+	
+	@property
+	def reaction(self):
+		"""Support reaction of the last solve, zero in unrestrained directions"""
+		if self.table.reaction is None:
+			raise AttributeError('The structure has not been solved yet.')
+		return self.table.reaction[self.n]
+	
+	def __eq__(self, other):
+		return isinstance(other, Node) and self.table is other.table and self.n == other.n
+	
+	def __hash__(self):
+		return hash((id(self.table), self.n))
 	
 	def __str__(self):
 		return f"{self.__class__.__name__}({self.x:1.1f}, {self.y:1.1f})"
 
 class Member(object):
-	"""Define Member base class"""
+	"""
+	Define Member base class. Like `Node`, a member is a view onto one row
+	of a `MemberTable` and is created with `Structure.addMember`.
+	"""
 	
-	def __init__(self, SN, EN, material=ma.Steel(), cross=xs.generalSection(), expectedaxial=None):
-		self.cross = cross
-		self.material = material
-
-		# assign start and end node properties
-		self.SN = SN
-		self.EN = EN
-
-		# the axial force
-		#self.axial = 0
-		self.expectedaxial = expectedaxial
+	__slots__ = ('table', 'index')
+	
+	def __init__(self, table, index):
+		self.table = table
+		self.index = index
+	
+	@property
+	def SN(self):
+		return self.table.nodes[self.table.ends[self.index, 0]]
+	
+	@property
+	def EN(self):
+		return self.table.nodes[self.table.ends[self.index, 1]]
+	
+	@property
+	def cross(self):
+		return self.table.sections[self.table.section[self.index]]
+	
+	@cross.setter
+	def cross(self, value):
+		self.table.section[self.index] = self.table.sectionId(value)
+		self.table.touch('section')
+	
+	@property
+	def material(self):
+		return self.table.materials[self.table.material[self.index]]
+	
+	@material.setter
+	def material(self, value):
+		self.table.material[self.index] = self.table.materialId(value)
+		self.table.touch('material')
+	
+	@property
+	def expectedaxial(self):
+		value = self.table.expectedaxial[self.index]
+		return None if np.isnan(value) else float(value)
+	
+	@expectedaxial.setter
+	def expectedaxial(self, value):
+		self.table.expectedaxial[self.index] = np.nan if value is None else value
+		self.table.touch('expectedaxial')
 
 	@property
 	def vector(self):
@@ -71,8 +164,7 @@ class Member(object):
 	@property
 	def DoF(self):
 		"""The global degree of freedom numbering for the start and end nodes"""
-		nDoF = self.__class__.nDoFPerNode
-		return [nDoF*self.SN.n + i for i in range(nDoF)] + [nDoF*self.EN.n + i for i in range(nDoF)]
+		return self.table.DoF[self.index]
 	
 	def __repr__(self):
 		return f'{self.__class__.__name__}({self.SN}, {self.EN})'
@@ -82,13 +174,19 @@ class Structure(object):
 	"""
 	Abstract base class for Truss and Frame classes.
 	"""
-	def __init__(self, cross=None, material=None, withCaching=True):
-		self.members = []
-		self.nodes = []
-		self.nNodes = 0
-		self.nMembers = 0
+	renumberings = [None, 'rcm']
+	
+	def __init__(self, cross=None, material=None, withCaching=True, sparse=False, renumber=None, cacheLimit=None):
+		self.nodes = NodeTable(self.__class__.NodeType)
+		self.members = MemberTable(self.__class__.MemberType, self.nodes)
 		
 		self.withCaching = withCaching
+		self.cache = Cache(maxBytes=cacheLimit)
+		self.sparse = sparse # assemble K as a scipy.sparse CSC matrix
+		
+		if renumber not in self.__class__.renumberings:
+			raise ValueError(f'Not a valid renumbering. Valid types: {self.__class__.renumberings}')
+		self.renumber = renumber # DoF ordering used to factorize reducedK
 		
 		if cross is None or material is None:
 			raise ValueError('Please define default cross section or material type.')
@@ -98,126 +196,736 @@ class Structure(object):
 
 	@classmethod
 	def from_yaml_file(cls, filePath):
+		"""
+		Read a structure from a YAML model file. The file is streamed rather
+		than loaded as a whole; its `Loads` are kept as the load vector
+		`loading` of the structure.
+		"""
+		from StructPy import yaml_reader
+		return yaml_reader.read(cls, filePath)
+
+	def save(self, path, matrices=True):
+		"""
+		Save the structure, its results and (with `matrices`) its stiffness
+		matrix and factorization to a single .npz file.
+		"""
+		from StructPy import archive
+		archive.save(self, path, matrices)
 
-		## Read in yaml file as a dictionary
-		with open(filePath, 'r') as stream:
-			try:
-				data = yaml.safe_load(stream)
-			except yaml.YAMLError as exc:
-				print(exc)
-
-		## Initialize structure
-		xsection = xs.generalSection(**data['XSection'])
-		material = ma.Custom(**data['Material'])
-		s1 = cls(cross=xsection, material=material)
-
-		## Add nodes
-		nodeMap = {} # map nodes to indicies
-		for i, node in enumerate(data['Nodes']):
-			for key, value in node.items():
-				try:
-					s1.addNode(value['x'], value['y'], fixity=value['fixity'])
-				except KeyError:
-					s1.addNode(value['x'], value['y'])
-
-				nodeMap.update({key: i})
-
-		## Add members
-		for member in data['Members']:
-			for key, value in member.items():
-				SN, EN = key.split(',')
-				s1.addMember(nodeMap[SN], nodeMap[EN], expectedaxial=value['axial'])
-
-		return s1
+	@classmethod
+	def load(cls, path):
+		"""
+		Reopen a structure saved with `save`. Its arrays are memory-mapped from
+		the file and a saved factorization is reused by the next solve.
+		"""
+		from StructPy import archive
+		return archive.load(path, cls)
 
 	def addNode(self, x, y, cost=0, fixity='free'):
 		"""
 		Add node to the structure
 		"""
-		n = self.nNodes  # node number
-		node = self.__class__.NodeType(x, y, n=n, cost=cost, fixity=fixity)
-		self.nodes.append(node)
-		self.nNodes += 1
-		
-		#invalidate cached quantities
-		self.__cache__reducedK = None
-		self.__cache__K = None
+		self.nodes.append(xy=(x, y), cost=cost, fixity=self.nodes.fixityCode(fixity))
 	
 	def addMember(self, SN, EN, material=None, cross=None, expectedaxial=None):
 		"""Add member to the structure"""
-		SN = self.nodes[SN]
-		EN = self.nodes[EN]
+		SN = self.nodes[SN].n
+		EN = self.nodes[EN].n
 
 		if material is None:
 			material=self.defaultmaterial
 		if cross is None:
 			cross = self.defaultcross
 		
-		member = self.__class__.MemberType(SN, EN, material, cross, expectedaxial=expectedaxial)
-		
-		self.members.append(member)
-		self.nMembers += 1
-		
-		#invalidate cached quantities
-		self.__cache__reducedK = None
-		self.__cache__K = None
+		self.members.append(
+			ends=(SN, EN),
+			section=self.members.sectionId(cross),
+			material=self.members.materialId(material),
+			expectedaxial=np.nan if expectedaxial is None else expectedaxial,
+			DoF=self.members.DoFOf(SN, EN))
+
+	def addNodes(self, x, y, cost=0, fixity='free'):
+		"""
+		Add many nodes at once. x, y and cost are arrays (or scalars shared by
+		every node) and fixity is a support type or an array of them (or of
+		their codes, see `nodes.fixityNames`). Returns the indices of the new
+		nodes.
+		"""
+		x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+		x, y = x.ravel(), y.ravel()
+		if not np.all(np.isfinite(x) & np.isfinite(y)):
+			raise ValueError('Node coordinates must be finite.')
+
+		fixity = np.asarray(fixity)
+		if np.issubdtype(fixity.dtype, np.integer):
+			# already coded, see `nodes.fixityNames`
+			if np.any((fixity < 0) | (fixity >= len(self.nodes.fixityNames))):
+				raise ValueError(f'Not a valid nodal support code. Valid codes: 0 to {len(self.nodes.fixityNames) - 1}')
+			codes = fixity
+		else:
+			names, inverse = np.unique(fixity, return_inverse=True)
+			codes = np.array([self.nodes.fixityCode(name) for name in names.tolist()], dtype=np.int8)[inverse.ravel()]
+
+		return self.nodes.extend(len(x), xy=np.column_stack([x, y]), cost=cost, fixity=codes)
+
+	def addMembers(self, SN, EN, material=None, cross=None, materialIds=None, sectionIds=None, expectedaxial=None):
+		"""
+		Add many members at once from arrays of start and end nodes. `cross`
+		and `material` are either one section/material for every member or
+		lists of them, indexed per member by `sectionIds`/`materialIds`.
+
+		The batch is validated before anything is added: every node must
+		exist, no member may have zero length and no member may connect the
+		same pair of nodes as another one, in the batch or already in the
+		structure. Returns the indices of the new members.
+		"""
+		nNodes = self.nNodes
+		SN = np.asarray(SN).ravel()
+		EN = np.asarray(EN).ravel()
+		if SN.shape != EN.shape:
+			raise ValueError('SN and EN must have the same number of members.')
+		if not (np.issubdtype(SN.dtype, np.integer) and np.issubdtype(EN.dtype, np.integer)) and len(SN):
+			raise ValueError('Node numbers must be integers.')
+		SN = SN.astype(np.int64)
+		EN = EN.astype(np.int64)
+
+		missing = (SN < -nNodes) | (SN >= nNodes) | (EN < -nNodes) | (EN >= nNodes)
+		if missing.any():
+			raise IndexError(f'Members {self._listed(missing)} connect nodes that do not exist.')
+		SN = np.where(SN < 0, SN + nNodes, SN)
+		EN = np.where(EN < 0, EN + nNodes, EN)
+
+		xy = self.nodes.xy
+		zeroLength = ~np.any(xy[EN] != xy[SN], axis=1)
+		if zeroLength.any():
+			raise ValueError(f'Members {self._listed(zeroLength)} have zero length.')
+
+		# members are the same regardless of direction
+		key = lambda ends: np.minimum(*ends.T)*nNodes + np.maximum(*ends.T)
+		keys = key(np.column_stack([SN, EN]))
+		duplicate = np.isin(keys, key(self.members.ends))
+		order = np.argsort(keys, kind='stable')
+		duplicate[order[1:][keys[order][1:] == keys[order][:-1]]] = True
+		if duplicate.any():
+			raise ValueError(f'Members {self._listed(duplicate)} duplicate other members.')
+
+		section = self._ids(self.defaultcross if cross is None else cross, sectionIds, self.members.sectionId, 'section')
+		material = self._ids(self.defaultmaterial if material is None else material, materialIds, self.members.materialId, 'material')
+
+		nDoF = self.__class__.MemberType.nDoFPerNode
+		local = np.arange(nDoF)
+		DoF = np.column_stack([nDoF*SN[:, None] + local, nDoF*EN[:, None] + local])
+
+		return self.members.extend(len(SN), ends=np.column_stack([SN, EN]), section=section,
+			material=material, expectedaxial=np.nan if expectedaxial is None else expectedaxial, DoF=DoF)
+
+	@staticmethod
+	def _listed(mask, limit=5):
+		"""The indices where `mask` is set, for error messages"""
+		indices = np.flatnonzero(mask)
+		listed = ', '.join(str(i) for i in indices[:limit])
+		return listed + (f' (and {len(indices) - limit} more)' if len(indices) > limit else '')
+
+	@staticmethod
+	def _ids(items, indices, intern, kind):
+		"""Table ids of one section/material, or of a list of them picked by `indices`"""
+		if not isinstance(items, (list, tuple)):
+			return intern(items)
+		if indices is None:
+			raise ValueError(f'Please give the {kind} index of every member.')
+		indices = np.asarray(indices)
+		missing = (indices < 0) | (indices >= len(items))
+		if missing.any():
+			raise IndexError(f'Members {Structure._listed(missing)} use a {kind} that does not exist.')
+		return np.array([intern(item) for item in items], dtype=np.int32)[indices]
+
+	def epoch(self, name):
+		"""
+		Epoch of a model entity, used to validate cached properties. Entities
+		are the columns of the node and member tables, the contents of the
+		`sections` and `materials` in use, or any other attribute, whose
+		value is used as is.
+		"""
+		if name in self.nodes.epochs:
+			return self.nodes.epochs[name]
+		elif name in self.members.epochs:
+			return self.members.epochs[name]
+		elif name == 'sections':
+			return tuple([getattr(cross, '_version', 0) for cross in self.members.sections])
+		elif name == 'materials':
+			return tuple([getattr(material, '_version', 0) for material in self.members.materials])
+		return getattr(self, name)
+	
+	def invalidate(self):
+		"""Clear all cached quantities"""
+		self.cache.clear()
+	
+	@property
+	def nNodes(self):
+		return len(self.nodes)
+	
+	@property
+	def nMembers(self):
+		return len(self.members)
 	
 	@property
 	def BC(self):
 		"""Define global boundary condition array"""
-		return np.array( flatten( [list(node.BC) for node in self.nodes] ))
+		return self.nodes.BC.ravel()
 	
 	@property
 	def freeDoF(self):
 		return self.BC == 1
 	
-	@cached_property
+	@cached_property('K', 'fixity')
 	def reducedK(self):
-		return self.K[np.ix_(self.freeDoF, self.freeDoF)]
+		return self.reduce(self.K)
+	
+	def reduce(self, matrix):
+		"""The rows and columns of a global (dense or sparse) matrix at the free DoFs"""
+		if self.sparse:
+			free = np.flatnonzero(self.freeDoF)
+			return matrix[free, :][:, free]
+		return matrix[np.ix_(self.freeDoF, self.freeDoF)]
 	
 	@property
 	def nDoF(self):
 		return self.__class__.nDoFPerNode * self.nNodes
+	
+	@property
+	def DoFMap(self):
+		"""Global DoF numbers of every member, shape (nMembers, 2*nDoFPerNode)"""
+		return self.members.DoF
+	
+	@property
+	def coordinates(self):
+		"""Nodal coordinates, shape (nNodes, 2)"""
+		return self.nodes.xy
+	
+	@property
+	def connectivity(self):
+		"""Start and end node numbers of every member, shape (nMembers, 2)"""
+		return self.members.ends
+	
+	@cached_property('xy', 'ends')
+	def memberVectors(self):
+		"""Start-to-end vector of every member, shape (nMembers, 2)"""
+		xy = self.coordinates
+		SN, EN = self.connectivity.T
+		return xy[EN] - xy[SN]
+	
+	@cached_property('section', 'material', 'sections', 'materials')
+	def memberProperties(self):
+		"""Arrays of A, E and Ix for every member (NaN where undefined)"""
+		A = self.members.sectionProperty('A')
+		E = self.members.materialProperty('E')
+		I = self.members.sectionProperty('Ix')
+		return A, E, I
+	
+	@cached_property('memberVectors', 'memberProperties')
+	def kglobals(self):
+		"""Global element stiffness matrices of every member, stacked"""
+		A, E, I = self.memberProperties
+		return self.__class__.MemberType.stackedKglobal(self.memberVectors, A, E, I)
+	
+	def elementMatrices(self, cross=None, A=None, E=None, I=None):
+		"""
+		Stacked global element matrices with member properties replaced.
+		`cross` is a section whose A and Ix are used for every member, and A,
+		E, I override single properties. Values broadcast against
+		(nMembers,), so a vectorized section family with dimensions shaped
+		(nDesigns, 1) or (nDesigns, nMembers) gives one stack of element
+		matrices per candidate design, shape (nDesigns, nMembers, ...).
+		"""
+		A0, E0, I0 = self.memberProperties
+		if cross is not None:
+			A0 = cross.A
+			I0 = getattr(cross, 'Ix', I0)
+		A = A0 if A is None else A
+		E = E0 if E is None else E
+		I = I0 if I is None else I
+		return self.__class__.MemberType.stackedKglobal(self.memberVectors, A, E, np.asarray(I, dtype=float))
+	
+	def populationSolve(self, loading, cross=None, A=None, E=None, I=None):
+		"""
+		Displacements of a whole population of candidate designs at once,
+		shape (nDesigns, nDoF). The designs are given as in
+		`elementMatrices`; their stiffness matrices are assembled and solved
+		as one batched dense operation.
+		"""
+		ke = self.elementMatrices(cross=cross, A=A, E=E, I=I)
+		ke = ke.reshape((-1,) + ke.shape[-3:])
+		nDesigns = ke.shape[0]
+		n = self.nDoF
 		
-	@cached_property
-	def K(self):
-		"""Build global structure stiffness matrix"""
+		# sum duplicate positions of the flattened K for all designs at once
+		rows, cols, values = self.triplets
+		position = rows*n + cols
+		order = np.argsort(position, kind='stable')
+		unique, starts = np.unique(position[order], return_index=True)
+		K = np.zeros((nDesigns, n*n))
+		K[:, unique] = np.add.reduceat(ke.reshape(nDesigns, -1)[:, order], starts, axis=1)
+		K = K.reshape(nDesigns, n, n)
 		
-		K = np.zeros([self.nDoF, self.nDoF])
+		free = np.flatnonzero(self.freeDoF)
+		reducedK = K[:, free[:, None], free]
+		reducedF = np.broadcast_to(np.asarray(loading, dtype=float)[free], (nDesigns, len(free)))
 		
-		for member in self.members:
-			K[np.ix_(member.DoF, member.DoF)] += member.kglobal
+		globalD = np.zeros((nDesigns, n))
+		globalD[:, free] = np.linalg.solve(reducedK, reducedF[..., None])[..., 0]
+		return globalD
+	
+	@property
+	def triplets(self):
+		"""COO (row, col, value) triplets of the global stiffness matrix"""
+		return self.scatter(self.kglobals)
+	
+	def scatter(self, matrices):
+		"""COO (row, col, value) triplets of stacked global element matrices"""
+		DoF = self.DoFMap
+		nDoF = DoF.shape[1]
+		rows = np.repeat(DoF, nDoF, axis=1).ravel()
+		cols = np.tile(DoF, (1, nDoF)).ravel()
+		return rows, cols, matrices.ravel()
 		
-		return K
+	@cached_property('kglobals', 'DoF', 'sparse')
+	def K(self):
+		"""
+		Build global structure stiffness matrix. The triplets of all members
+		are summed in one pass; with `sparse=True` the result is a CSC matrix
+		so memory scales with the number of non-zeros.
+		"""
+		rows, cols, values = self.triplets
+		return assemble(rows, cols, values, self.nDoF, sparse=self.sparse)
+	
+	def isStable(self, tol=1e-10):
+		"""
+		Check stability from the pivots of the cached factorization of
+		reducedK, which the solve reuses. Raises UnstableStructureError naming
+		the nodes and DoFs of the mechanism.
+		"""
+		factorization = self.factorization
+		singular = factorization.singularDoF(tol)
+		if len(singular) == 0 and not factorization.failed:
+			return
+		
+		DoF = np.flatnonzero(self.freeDoF)[singular]
+		if len(DoF) == 0:
+			raise UnstableStructureError('Structure is unstable. The stiffness matrix is singular.')
+		nDoFPerNode = self.__class__.nDoFPerNode
+		names = self.__class__.NodeType.DoFNames
+		where = ', '.join([f'node {d // nDoFPerNode} ({names[d % nDoFPerNode]})' for d in DoF])
+		logging.warning(f'Singular pivots at global DoF {DoF.tolist()}')
+		raise UnstableStructureError(f'Structure is unstable. Mechanism at {where}.', DoF)
+	
+	@cached_property('ends', 'fixity', 'renumber')
+	def DoFOrder(self):
+		"""
+		Order in which the free DoFs are factorized, or None to keep the node
+		insertion order. With `renumber='rcm'` the nodes are renumbered by
+		reverse Cuthill-McKee on the member connectivity, which keeps reducedK
+		banded. K, reducedK and all results stay in the user's numbering.
+		"""
+		if self.renumber is None:
+			return None
+		
+		nDoFPerNode = self.__class__.nDoFPerNode
+		nodeOrder = reverseCuthillMcKee(self.connectivity, self.nNodes)
+		DoF = (nDoFPerNode*nodeOrder[:, None] + np.arange(nDoFPerNode)).ravel()
+		reduced = np.cumsum(self.freeDoF) - 1  # index of each global DoF in reducedK
+		return reduced[DoF[self.freeDoF[DoF]]]
 	
-	def isStable(self):
-		"""Check stability"""
-		eigs, vecs = np.linalg.eig(self.reducedK)
-		if np.isclose(eigs, 0).any() == True:
-			logging.warning(eigs)
-			raise ValueError('Structure is unstable.')
+	@cached_property('reducedK', 'DoFOrder')
+	def factorization(self):
+		"""Factorization of reducedK, reused by every solve until the structure changes"""
+		return Factorization(self.reducedK, order=self.DoFOrder)
 	
-	def solve(self, loading):
-		"""Execute direct stiffness solving"""
+	def solve(self, loading, solver='direct', **options):
+		"""
+		Execute direct stiffness solving. `loading` is a global load vector or
+		an (nDoF, nCases) matrix with one load case per column. With
+		solver='pcg' the system is solved iteratively, see `iterativeSolve`
+		for the options.
+		"""
+		loading = np.asarray(loading)
 		reducedF = loading[self.freeDoF]
-		reducedD = np.linalg.solve(self.reducedK, reducedF)
+		if solver == 'direct':
+			reducedD = self.factorization.solve(reducedF)
+		elif solver == 'pcg':
+			reducedD = self.iterativeSolve(reducedF, **options)
+		else:
+			raise ValueError("Not a valid solver. Valid types: 'direct', 'pcg'")
 		
-		globalD = self.BC
+		globalD = np.zeros(loading.shape)
 		globalD[self.freeDoF] = reducedD
 		
 		return globalD
+	
+	def iterativeSolve(self, reducedF, preconditioner='jacobi', tol=1e-8, maxiter=None, x0=None, matrixFree=False):
+		"""
+		Solve reducedK d = reducedF by preconditioned conjugate gradient.
 		
-	def directStiffness(self, loading):
-		"""This executes the direct stiffness method"""
+		preconditioner: 'jacobi', 'ic', 'amg' or None
+		tol: relative residual ||K d - F|| / ||F|| to reach
+		x0: global displacements to warm-start from, e.g. a previous solution
+		matrixFree: apply K from the element matrices without assembling it
+			(only with 'jacobi' or no preconditioner)
 		
-		self.isStable()
-		globalD = self.solve(loading)
-		nDoFPerNode = self.__class__.nDoFPerNode
-		for i, node in enumerate(self.nodes):
-			node.deformation = [globalD[nDoFPerNode*node.n+i] for i in range(nDoFPerNode)]
+		The iteration statistics are kept in `solverInfo`, one dict per load case.
+		"""
+		if matrixFree:
+			K = ElementOperator(self.kglobals, self.DoFMap, self.freeDoF)
+		else:
+			K = self.reducedK
+		M = buildPreconditioner(K, preconditioner)
+		
+		F = reducedF.reshape(len(reducedF), -1)
+		if x0 is not None:
+			x0 = np.asarray(x0, dtype=float)[self.freeDoF].reshape(F.shape)
+		
+		D = np.zeros(F.shape)
+		self.solverInfo = []
+		for i in range(F.shape[1]):
+			D[:, i], info = pcg(K, F[:, i], M, None if x0 is None else x0[:, i], tol, maxiter)
+			if not info['converged']:
+				logging.warning(f"PCG stopped after {info['iterations']} iterations with residual {info['residual']:.2e}")
+			self.solverInfo.append(info)
+		
+		return D.reshape(reducedF.shape)
+		
+	def equilibrium(self, D, loading, matrixFree=False):
+		"""
+		Support reactions and equilibrium residual of the displacements D
+		under `loading`, both from the single product K D (a sparse mat-vec
+		when K is sparse). K D - F is the reaction at restrained DoFs and the
+		out-of-balance force at free DoFs. Returns the reactions, shaped like
+		D and zero at free DoFs, and ||K D - F|| over the free DoFs, one value
+		per load case.
+		"""
+		D = np.asarray(D, dtype=float)
+		loading = np.asarray(loading, dtype=float)
+		if matrixFree:
+			K = ElementOperator(self.kglobals, self.DoFMap, np.ones(self.nDoF, dtype=bool))
+			KD = np.column_stack([K.dot(d) for d in D.reshape(self.nDoF, -1).T]).reshape(D.shape)
+		else:
+			KD = self.K @ D
+		imbalance = KD - loading
+		
+		free = self.freeDoF.reshape((-1,) + (1,)*(D.ndim - 1))
+		reactions = np.where(free, 0, imbalance)
+		residual = np.linalg.norm(np.where(free, imbalance, 0), axis=0)
+		return reactions, residual
+		
+	def directStiffness(self, loading, solver='direct', **options):
+		"""
+		This executes the direct stiffness method. The support reactions and
+		the equilibrium residual ||K d - F|| of the solution are kept in
+		`reactions` and `residual` (see `equilibrium`).
+		"""
+		
+		if solver == 'direct':
+			self.isStable()
+		globalD = self.solve(loading, solver=solver, **options)
+		shape = (self.nNodes, self.__class__.nDoFPerNode) + globalD.shape[1:]
+		self.nodes.deformation = globalD.reshape(shape)
+		
+		self.reactions, self.residual = self.equilibrium(globalD, loading, options.get('matrixFree', False))
+		self.nodes.reaction = self.reactions.reshape(shape)
 			
 		return globalD
 
+	def memberForces(self, D=None, members=None, fixedEnd=None):
+		"""
+		Internal forces of every member, in member order, recovered in one
+		batched operation from the global displacements D (by default those
+		of the last `directStiffness`). Trusses give the axial force of each
+		member, frames the local end forces [N1, V1, M1, N2, V2, M2]. If D
+		holds several load cases, the cases are the last axis of the result.
+		`members` selects the members to recover, by default all of them.
+		
+		Element loads only reach the nodes as equivalent nodal loads, so
+		their local fixed-end forces (see `Loading.fixedEndForces`), shaped
+		(nMembers, 2*nDoFPerNode) plus the cases of D, must be passed as
+		`fixedEnd` to be added back.
+		"""
+		if D is None:
+			if self.nodes.deformation is None:
+				raise AttributeError('The structure has not been solved yet.')
+			D = self.nodes.deformation.reshape((self.nDoF,) + self.nodes.deformation.shape[2:])
+		D = np.asarray(D, dtype=float)
+		members = slice(None) if members is None else np.asarray(members)
+		DoFMap = self.DoFMap[members]
+		d = D[DoFMap].reshape(DoFMap.shape + (-1,))
+		
+		if fixedEnd is not None:
+			fixedEnd = np.asarray(fixedEnd, dtype=float)[members].reshape(d.shape)
+		
+		A, E, I = [np.broadcast_to(value, (self.nMembers,))[members] for value in self.memberProperties]
+		forces = self.__class__.MemberType.stackedForces(self.memberVectors[members], A, E, I, d, fixedEnd)
+		return forces.reshape(forces.shape[:-1] + D.shape[1:])
+	
+	def axialTension(self, D):
+		"""Axial force of every member, tension positive, from the global displacements D"""
+		nDoFPerNode = self.__class__.nDoFPerNode
+		d = np.asarray(D, dtype=float).reshape(self.nNodes, nDoFPerNode)[:, :2]
+		SN, EN = self.connectivity.T
+		L = np.linalg.norm(self.memberVectors, axis=1)
+		elongation = np.einsum('mi,mi->m', self.memberVectors, d[EN] - d[SN]) / L
+		A, E, I = self.memberProperties
+		return A*E/L * elongation
+	
+	def geometricStiffness(self, loading):
+		"""
+		Geometric stiffness matrix Kg of the member axial forces under the
+		reference `loading`, assembled from stacked element matrices like K
+		(sparse when the structure is).
+		"""
+		N = self.axialTension(self.solve(loading))
+		kg = self.__class__.MemberType.stackedKgeometric(self.memberVectors, N)
+		rows, cols, values = self.scatter(kg)
+		return assemble(rows, cols, values, self.nDoF, sparse=self.sparse)
+	
+	def secondOrder(self, loading, nSteps=10, tol=1e-8, maxiter=20):
+		"""
+		Second-order (P-Δ) displacements under `loading`, by Newton-Raphson
+		iterations on (K + Kg(N(d))) d = λ loading with the load factor λ
+		raised to 1 in nSteps equal steps. Each iteration uses the tangent
+		K + Kg of the current axial forces.
+		
+		The DoF scatter map, the sparsity pattern of the tangent and the
+		factorization ordering are worked out once (see `solvers.Pattern`);
+		an iteration only recomputes the Kg values, sums them into place and
+		refactorizes numerically.
+		
+		An iteration has converged when ||λF - (K + Kg) d|| / ||λF|| < tol.
+		Every iteration is recorded in `nonlinearInfo`: its step, load factor,
+		relative residual and the seconds spent assembling, factorizing and
+		solving. Raises UnstableStructureError if the tangent stops being
+		positive definite (the load exceeds the buckling load) and
+		ValueError if a step does not converge in maxiter iterations.
+		"""
+		self.isStable()
+		# keep the (fill-reducing) ordering K was factorized in
+		order = self.factorization.factorOrder()
+		rows, cols, _ = self.triplets
+		pattern = Pattern(rows, cols, self.freeDoF, order=order, sparse=self.sparse)
+		MemberType = self.__class__.MemberType
+		
+		F = np.asarray(loading, dtype=float)[self.freeDoF]
+		globalD = np.zeros(self.nDoF)
+		d = np.zeros(len(F))
+		self.nonlinearInfo = []
+		for step in range(1, nSteps + 1):
+			factor = step/nSteps
+			for iteration in range(maxiter + 1):
+				start = time.perf_counter()
+				globalD[self.freeDoF] = d
+				kg = MemberType.stackedKgeometric(self.memberVectors, self.axialTension(globalD))
+				KT = pattern.assemble((self.kglobals + kg).ravel())
+				r = factor*F - pattern.dot(KT, d)
+				residual = np.linalg.norm(r) / np.linalg.norm(factor*F)
+				assembled = time.perf_counter()
+				info = {'step': step, 'loadFactor': factor, 'iteration': iteration, 'residual': residual,
+					'assemble': assembled - start, 'factorize': 0.0, 'solve': 0.0}
+				self.nonlinearInfo.append(info)
+				if residual < tol:
+					break
+				if iteration == maxiter:
+					raise ValueError(f'Load step {step} did not converge in {maxiter} iterations '
+						f'(residual {residual:.2e}).')
+				
+				factorization = Factorization(KT, order=order, permuted=True)
+				if not factorization.positiveDefinite:
+					raise UnstableStructureError(f'The tangent stiffness is not positive definite in load step {step}; '
+						'the load exceeds the buckling load.')
+				factorized = time.perf_counter()
+				d = d + factorization.solve(r)
+				info['factorize'] = factorized - assembled
+				info['solve'] = time.perf_counter() - factorized
+		
+		globalD[self.freeDoF] = d
+		self.nodes.deformation = globalD.reshape(self.nNodes, self.__class__.nDoFPerNode)
+		return globalD
+	
+	def inverseEigen(self, A, nModes):
+		"""
+		The nModes largest eigenvalues μ of A φ = μ reducedK φ, for a
+		symmetric matrix A on the free DoFs, and their eigenvectors.
+		
+		Lanczos iterations apply K^-1 through the cached factorization of
+		reducedK (shift-invert about zero), so only sparse products and
+		triangular solves are needed and large sparse models stay
+		tractable. Very small models are solved densely.
+		"""
+		import scipy.sparse.linalg as spla
+		import scipy.linalg as la
+		n = A.shape[0]
+		if nModes < n - 1:
+			Kinv = spla.LinearOperator((n, n), matvec=self.factorization.solve, dtype=float)
+			mu, phi = spla.eigsh(A, k=nModes, M=self.reducedK, Minv=Kinv, which='LA')
+		else:
+			# too few DoFs for Lanczos
+			K = self.reducedK.toarray() if self.sparse else self.reducedK
+			mu, phi = la.eigh(A.toarray() if self.sparse else A, K)
+		order = np.argsort(-mu)[:nModes]
+		return mu[order], phi[:, order]
+	
+	def buckling(self, loading, nModes=1):
+		"""
+		Lowest critical load factors and buckling modes for the reference
+		`loading`: the smallest positive λ with (K + λ Kg) φ = 0, solved as
+		-Kg φ = (1/λ) K φ for the largest 1/λ (see `inverseEigen`).
+		
+		Returns the load factors (ascending) and the global mode shapes, one
+		column per mode, scaled to a largest component of 1.
+		"""
+		self.isStable()
+		mu, phi = self.inverseEigen(-self.reduce(self.geometricStiffness(loading)), nModes)
+		buckles = mu > 0
+		if not buckles.any():
+			raise ValueError('No member is in compression under the loading; the structure does not buckle.')
+		mu, phi = mu[buckles], phi[:, buckles]
+		
+		modes = np.zeros((self.nDoF, len(mu)))
+		modes[self.freeDoF] = phi / abs(phi).max(axis=0)
+		return 1/mu, modes
+	
+	def mass(self, lumped=False):
+		"""
+		Global mass matrix from the `massDensity` of the materials (mass per
+		unit volume, in units consistent with E), assembled from stacked element
+		matrices like K. Lumped mass puts half of each member's mass on the
+		translations of its end nodes; consistent mass uses the element
+		shape functions.
+		"""
+		A, E, I = self.memberProperties
+		density = self.members.materialProperty('massDensity')
+		if np.isnan(density).any():
+			raise ValueError('Every material needs a massDensity to build the mass matrix.')
+		m = self.__class__.MemberType.stackedMass(self.memberVectors, density*A, lumped)
+		rows, cols, values = self.scatter(m)
+		return assemble(rows, cols, values, self.nDoF, sparse=self.sparse)
+	
+	def modes(self, n=1, lumped=False):
+		"""
+		Lowest n natural frequencies and modes: the smallest ω² with
+		K φ = ω² M φ, solved as M φ = (1/ω²) K φ (see `inverseEigen`), so a
+		singular lumped M is fine.
+		
+		Returns the frequencies in cycles per unit time, the global mode
+		shapes normalized so that φ^T M φ = 1, and the modal participation
+		factors φ^T M r for ground motion in x and y, shape (n, 2). The
+		effective modal masses are their squares.
+		"""
+		self.isStable()
+		M = self.reduce(self.mass(lumped))
+		mu, phi = self.inverseEigen(M, n)
+		vibrates = mu > 0
+		mu, phi = mu[vibrates], phi[:, vibrates]
+		
+		Mphi = M @ phi
+		phi = phi / np.sqrt(np.einsum('ij,ij->j', phi, Mphi))
+		Mphi = M @ phi
+		
+		nDoFPerNode = self.__class__.nDoFPerNode
+		r = np.zeros((self.nDoF, 2))
+		r[0::nDoFPerNode, 0] = 1
+		r[1::nDoFPerNode, 1] = 1
+		participation = Mphi.T @ r[self.freeDoF]
+		
+		shapes = np.zeros((self.nDoF, len(mu)))
+		shapes[self.freeDoF] = phi
+		return np.sqrt(1/mu) / (2*np.pi), shapes, participation
+
+	def timeHistory(self, dt, loading=None, history=None, groundAcceleration=None, direction='x',
+			damping=0.05, dampedFrequencies=None, alpha=0, lumped=False, decimation=1, forces=True, output=None):
+		"""
+		Linear transient response by HHT-α time integration from rest (see
+		`dynamics.integrate`), with the effective stiffness factorized once.
+
+		loading, history: a global load vector (or (nDoF, nPatterns) matrix)
+			and its multiplier at every step, shape (nSteps + 1,) (or
+			(nPatterns, nSteps + 1))
+		groundAcceleration: a support acceleration record in `direction`,
+			one value per step, applied as the loads -M r ag(t)
+		damping: Rayleigh damping ratio at the `dampedFrequencies`, by
+			default the first two natural frequencies
+		alpha: HHT parameter between -1/3 and 0 (0 is Newmark's average
+			acceleration method)
+		decimation: keep every `decimation`-th step
+		output: a directory to stream the results to, as memory-mapped
+			displacements.npy and memberForces.npy
+
+		Returns the time of every kept step, the global displacements
+		(nRecords, nDoF) and the member forces (nRecords, nMembers, ...), or
+		None without `forces`.
+		"""
+		from StructPy.dynamics import integrate, rayleigh
+		self.isStable()
+		M = self.reduce(self.mass(lumped))
+		patterns, histories = [], []
+		if loading is not None:
+			loading = np.asarray(loading, dtype=float)
+			patterns.append(loading[self.freeDoF].reshape(M.shape[0], -1))
+			histories.append(np.atleast_2d(np.asarray(history, dtype=float)))
+		if groundAcceleration is not None:
+			r = np.zeros(self.nDoF)
+			r[self.__class__.whatDoF.index(direction)::self.__class__.nDoFPerNode] = 1
+			patterns.append(-(M @ r[self.freeDoF])[:, None])
+			histories.append(np.atleast_2d(np.asarray(groundAcceleration, dtype=float)))
+		if not patterns:
+			raise ValueError('A time history needs a loading and its history or a ground acceleration.')
+		if len({h.shape[1] for h in histories}) > 1:
+			raise ValueError('The load history and the ground acceleration must have the same number of steps.')
+
+		C = (0, 0)
+		if damping:
+			if dampedFrequencies is None:
+				dampedFrequencies = self.modes(2, lumped)[0]
+			C = rayleigh(damping, *dampedFrequencies)
+		return integrate(self, M, C, np.hstack(patterns), np.vstack(histories), dt, alpha=alpha,
+			decimation=decimation, forces=forces, directory=output)
+
+	def influenceLines(self, path, members=(), reactions=(), displacements=(), direction='y'):
+		"""
+		Influence lines along a load path for a unit load acting in the
+		negative `direction` ('x' or 'y'), i.e. downward by default.
+		
+		path: node numbers, or (member, fraction) pairs for positions along
+			a member, whose load is shared by its end nodes (as through a
+			floor system)
+		members: members whose forces are wanted (see `memberForces`)
+		reactions, displacements: global DoF numbers
+		
+		All positions are solved at once with the cached factorization.
+		Returns an `influence.InfluenceLines`, whose `movingLoad` gives the
+		envelopes under a train of axles.
+		"""
+		from StructPy.influence import InfluenceLines, pathPoints
+		SN, EN, t, x = pathPoints(self, path)
+		component = self.__class__.whatDoF.index(direction)
+		nDoFPerNode = self.__class__.nDoFPerNode
+		
+		positions = np.arange(len(t))
+		P = np.zeros((self.nDoF, len(t)))
+		np.add.at(P, (nDoFPerNode*SN + component, positions), -(1 - t))
+		np.add.at(P, (nDoFPerNode*EN + component, positions), -t)
+		
+		self.isStable()
+		D = self.solve(P)
+		
+		lines = {}
+		if len(members):
+			lines['members'] = self.memberForces(D, members)
+		if len(reactions):
+			reactions = np.asarray(reactions)
+			if self.freeDoF[reactions].any():
+				raise ValueError('Reactions are only defined at restrained DoFs.')
+			lines['reactions'] = self.K[reactions] @ D - P[reactions]
+		if len(displacements):
+			lines['displacements'] = D[np.asarray(displacements)]
+		return InfluenceLines(x, lines)
+
 class Planar(object):
 	
 	"""
@@ -228,6 +936,7 @@ class Planar(object):
 		"""
 		Plot the undeformed structure
 		"""
+		import matplotlib.pyplot as plt
 		plt.figure(1)
 		plt.clf()
 		plt.grid(True)
@@ -272,6 +981,7 @@ class Planar(object):
 			plt.show()
 
 	def plotDeformation(self, scale=100, nfig=1):
+		import matplotlib.pyplot as plt
 
 		plt.figure(nfig)
 		self.plot(show=False)
@@ -297,7 +1007,8 @@ class Planar(object):
 
 	def printMembers(self):
 		print('\nStructure Members:')
-		for i, member in enumerate(self.members):
-			string = 'Member %i: (%i --> %i), L = %.1f, f = %.2f'
-			variables = (i, member.SN.n, member.EN.n, member.length, member.axial)
-			print(string % variables)
+		forces = self.memberForces()
+		lengths = np.linalg.norm(self.memberVectors, axis=1)
+		for i, (SN, EN) in enumerate(self.connectivity):
+			f = ', '.join(['%.2f' % value for value in np.ravel(forces[i])])
+			print('Member %i: (%i --> %i), L = %.1f, f = %s' % (i, SN, EN, lengths[i], f))
@@ -0,0 +1,195 @@
+"""
+Compact, array-backed storage for the nodes and members of a structure.
+
+Every quantity is kept in a contiguous NumPy column whose first `len(table)`
+rows are in use, so the solver can read coordinates, fixities, connectivity and
+DoF numbers without touching Python objects. Indexing a table returns a light
+`__slots__` view (`Node`/`Member`) onto one row.
+"""
+
+import numpy as np
+from StructPy.Caching import tick
+
+
+class Table(object):
+	"""
+	Growable struct-of-arrays storage. `columns` maps a column name to its
+	(dtype, trailing shape, fill value). Capacity doubles as rows are added so
+	appending is amortized O(1).
+	
+	`epochs` records when each column was last modified; call `touch` after
+	writing to a column so cached quantities that depend on it are refreshed.
+	Indexing returns a `ViewType(table, index)` view of a row.
+	"""
+
+	columns = {}
+
+	def __init__(self, ViewType, capacity=16):
+		self.ViewType = ViewType
+		self.size = 0
+		self._data = {}
+		self.epochs = {name: tick() for name in self.columns}
+		for name, (dtype, shape, fill) in self.columns.items():
+			self._data[name] = np.full((capacity,) + shape, fill, dtype=dtype)
+
+	def __getattr__(self, name):
+		"""Columns are exposed as views of their rows in use"""
+		if name.startswith('_'):
+			raise AttributeError(name)
+		try:
+			return self._data[name][:self.size]
+		except KeyError:
+			raise AttributeError(f"'{self.__class__.__name__}' has no column '{name}'")
+
+	def __len__(self):
+		return self.size
+
+	def __iter__(self):
+		for i in range(self.size):
+			yield self[i]
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return [self[j] for j in range(*i.indices(self.size))]
+		i = int(i)
+		if i < 0:
+			i += self.size
+		if not 0 <= i < self.size:
+			raise IndexError(f'{self.__class__.__name__} index out of range')
+		return self.ViewType(self, i)
+
+	def reserve(self, n):
+		"""Make room for at least n rows"""
+		capacity = len(next(iter(self._data.values())))
+		if n <= capacity:
+			return
+		capacity = max(n, 2*capacity)
+		for name, (dtype, shape, fill) in self.columns.items():
+			grown = np.full((capacity,) + shape, fill, dtype=dtype)
+			grown[:self.size] = self._data[name][:self.size]
+			self._data[name] = grown
+
+	def touch(self, *names):
+		"""Mark columns as modified (all columns if none are named)"""
+		epoch = tick()
+		for name in names or self.columns:
+			self.epochs[name] = epoch
+
+	def append(self, **values):
+		"""Add one row and return its index"""
+		i = self.size
+		self.reserve(i + 1)
+		for name, value in values.items():
+			self._data[name][i] = value
+		self.size += 1
+		self.touch()
+		return i
+
+	def assign(self, **columns):
+		"""
+		Use existing arrays (e.g. memory-mapped ones) as the columns, in place
+		of the current rows. Every column must be given.
+		"""
+		self._data = {name: columns[name] for name in self.columns}
+		self.size = len(columns[next(iter(self.columns))])
+		self.touch()
+
+	def extend(self, n, **values):
+		"""
+		Add n rows at once from arrays (or scalars broadcast to every row) and
+		return their indices. The columns are touched once for the batch.
+		"""
+		start = self.size
+		self.reserve(start + n)
+		for name, value in values.items():
+			self._data[name][start:start + n] = value
+		self.size += n
+		self.touch()
+		return np.arange(start, start + n)
+
+
+class NodeTable(Table):
+	"""Coordinates, cost and fixity codes of every node"""
+
+	columns = {
+		'xy':     (float,   (2,), 0),
+		'cost':   (float,   (),   0),
+		'fixity': (np.int8, (),   0),  # index into `fixityNames`
+	}
+
+	def __init__(self, NodeType, capacity=16):
+		super().__init__(NodeType, capacity)
+		self.fixityNames = list(NodeType.fixities.keys())
+		self.fixityBC = np.array(list(NodeType.fixities.values()), dtype=float)
+		self.deformation = None  # (nNodes, nDoFPerNode) after a solve
+		self.reaction = None
+
+	def fixityCode(self, fixity):
+		"""Map a fixity name to its integer code"""
+		try:
+			return self.fixityNames.index(fixity)
+		except ValueError:
+			validKeys = ', '.join([str(key) for key in self.fixityNames])
+			raise ValueError(f'Not a valid nodal support type. Valid types: {validKeys}')
+
+	@property
+	def BC(self):
+		"""Boundary condition codes, shape (nNodes, nDoFPerNode)"""
+		return self.fixityBC[self.fixity]
+
+
+class MemberTable(Table):
+	"""
+	Connectivity, section/material ids and the precomputed DoF map of every
+	member. Sections and materials are stored once in `sections`/`materials`
+	and referenced by index.
+	"""
+
+	def __init__(self, MemberType, nodes, capacity=16):
+		nDoF = MemberType.nDoFPerNode
+		self.columns = {
+			'ends':          (np.int64, (2,),      0),
+			'section':       (np.int32, (),        0),
+			'material':      (np.int32, (),        0),
+			'expectedaxial': (float,    (),        np.nan),
+			'DoF':           (np.int64, (2*nDoF,), 0),
+		}
+		super().__init__(MemberType, capacity)
+		self.MemberType = MemberType
+		self.nodes = nodes
+		self.sections = []
+		self.materials = []
+		self._sectionIds = {}
+		self._materialIds = {}
+
+	def sectionId(self, cross):
+		"""Index of a cross section in `sections`, adding it if it is new"""
+		return self._intern(cross, self.sections, self._sectionIds)
+
+	def materialId(self, material):
+		"""Index of a material in `materials`, adding it if it is new"""
+		return self._intern(material, self.materials, self._materialIds)
+
+	@staticmethod
+	def _intern(item, items, ids):
+		try:
+			return ids[id(item)]
+		except KeyError:
+			ids[id(item)] = len(items)
+			items.append(item)
+			return ids[id(item)]
+
+	def DoFOf(self, SN, EN):
+		"""Global DoF numbers of a member between nodes SN and EN"""
+		nDoF = self.MemberType.nDoFPerNode
+		return np.concatenate([nDoF*SN + np.arange(nDoF), nDoF*EN + np.arange(nDoF)])
+
+	def sectionProperty(self, name):
+		"""A section property (e.g. 'A', 'Ix') for every member, NaN where undefined"""
+		values = np.array([getattr(cross, name, None) for cross in self.sections], dtype=float)
+		return values[self.section]
+
+	def materialProperty(self, name):
+		"""A material property (e.g. 'E') for every member, NaN where undefined"""
+		values = np.array([getattr(material, name, None) for material in self.materials], dtype=float)
+		return values[self.material]
@@ -0,0 +1,207 @@
+"""
+Streaming reader for the YAML model files (see `Unit Tests/Ex_*.yaml`).
+
+The document is never built as a tree. YAML events are read one at a time
+(with libyaml's C parser when it is available), and every node, member and
+load is appended straight to compact typed arrays. The model is then added to
+the structure in a single `addNodes`/`addMembers` batch, so memory grows with
+the size of the model rather than the size of the document.
+"""
+
+from array import array
+
+import numpy as np
+
+
+def _events(stream):
+	try:
+		import yaml
+	except ImportError:
+		raise ImportError('The library pyyaml is required to read a yaml file.')
+	Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+	return yaml, yaml.parse(stream, Loader=Loader)
+
+
+class ModelReader(object):
+	"""
+	Reads the sections of a model file from an event stream. Small sections
+	(Config, Material, XSection) are composed into dictionaries, while Nodes,
+	Members and Loads go into typed arrays entry by entry.
+	"""
+
+	def __init__(self, StructureType):
+		self.StructureType = StructureType
+		self.sections = {}
+
+		self.nodeIds = {}               # node label: index
+		self.x = array('d')
+		self.y = array('d')
+		self.fixityNames = []           # fixity names in order of appearance
+		self.fixity = array('b')        # index into fixityNames
+
+		self.SN = array('q')
+		self.EN = array('q')
+		self.axial = array('d')
+
+		self.loadNode = array('q')
+		self.loadDoF = array('q')       # DoF of the node loaded
+		self.loadValues = array('d')
+
+		# entries that refer to nodes listed further down the file:
+		# (array, index, node label), resolved at the end
+		self.pending = []
+
+	def read(self, stream):
+		self.yaml, events = _events(stream)
+		self.events = iter(events)
+		self.expect('StreamStartEvent')
+		self.expect('DocumentStartEvent')
+		self.expect('MappingStartEvent')
+
+		readers = {'Nodes': self.readNode, 'Members': self.readMember, 'Loads': self.readLoad}
+		for key in self.keys():
+			if key in readers:
+				for label, fields in self.entries():
+					readers[key](label, fields)
+			else:
+				self.sections[key] = self.compose(next(self.events))
+		return self
+
+	def expect(self, kind):
+		event = next(self.events)
+		if type(event).__name__ != kind:
+			raise ValueError(f'Invalid model file: expected {kind}, found {event} ({event.start_mark})')
+		return event
+
+	def keys(self):
+		"""Scalar keys of the mapping being read, up to its end"""
+		for event in self.events:
+			if isinstance(event, self.yaml.MappingEndEvent):
+				return
+			if not isinstance(event, self.yaml.ScalarEvent):
+				raise ValueError(f'Invalid model file: expected a key ({event.start_mark})')
+			yield event.value
+
+	def entries(self):
+		"""
+		(label, fields) of every entry of a Nodes/Members/Loads section. The
+		section is a list of single key mappings (`- A: {x: 0, y: 1}`) or a
+		mapping (`A: {x: 0, y: 1}`); fields are kept as strings.
+		"""
+		event = next(self.events)
+		if isinstance(event, self.yaml.ScalarEvent) and event.value in ('', '~', 'null'):
+			return
+		if isinstance(event, self.yaml.SequenceStartEvent):
+			for event in self.events:
+				if isinstance(event, self.yaml.SequenceEndEvent):
+					return
+				if not isinstance(event, self.yaml.MappingStartEvent):
+					raise ValueError(f'Invalid model file: expected an entry ({event.start_mark})')
+				yield from self.labelled()
+		elif isinstance(event, self.yaml.MappingStartEvent):
+			yield from self.labelled()
+		else:
+			raise ValueError(f'Invalid model file: expected a list of entries ({event.start_mark})')
+
+	def labelled(self):
+		for label in self.keys():
+			fields = {}
+			event = next(self.events)
+			if isinstance(event, self.yaml.MappingStartEvent):
+				for key in self.keys():
+					fields[key] = self.expect('ScalarEvent').value
+			elif not isinstance(event, self.yaml.ScalarEvent):
+				raise ValueError(f'Invalid model file: expected the fields of {label} ({event.start_mark})')
+			yield label, fields
+
+	def compose(self, event):
+		"""Python value of a (small) subtree starting at `event`"""
+		yaml = self.yaml
+		if isinstance(event, yaml.ScalarEvent):
+			loader = yaml.SafeLoader('')
+			tag = event.tag
+			if tag is None or tag == '!':
+				tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+			return loader.construct_object(yaml.ScalarNode(tag, event.value))
+		elif isinstance(event, yaml.SequenceStartEvent):
+			items = []
+			for event in self.events:
+				if isinstance(event, yaml.SequenceEndEvent):
+					return items
+				items.append(self.compose(event))
+		elif isinstance(event, yaml.MappingStartEvent):
+			return {key: self.compose(next(self.events)) for key in self.keys()}
+		raise ValueError(f'Invalid model file: unexpected {event} ({event.start_mark})')
+
+	def readNode(self, label, fields):
+		if label in self.nodeIds:
+			raise ValueError(f'Node {label} is defined twice.')
+		self.nodeIds[label] = len(self.x)
+		self.x.append(float(fields['x']))
+		self.y.append(float(fields['y']))
+		fixity = fields.get('fixity', 'free')
+		try:
+			self.fixity.append(self.fixityNames.index(fixity))
+		except ValueError:
+			self.fixityNames.append(fixity)
+			self.fixity.append(len(self.fixityNames) - 1)
+
+	def readMember(self, label, fields):
+		try:
+			SN, EN = [name.strip() for name in str(label).split(',')]
+		except ValueError:
+			raise ValueError(f'Member {label} must be given as SN,EN.')
+		self.appendNode(self.SN, SN)
+		self.appendNode(self.EN, EN)
+		self.axial.append(float(fields['axial']) if 'axial' in fields else np.nan)
+
+	def readLoad(self, label, fields):
+		DoFNames = self.StructureType.whatDoF
+		for name, value in fields.items():
+			if name not in DoFNames:
+				raise ValueError(f'Not a valid load direction: {name}. Valid directions: {", ".join(DoFNames)}')
+			self.appendNode(self.loadNode, label)
+			self.loadDoF.append(DoFNames.index(name))
+			self.loadValues.append(float(value))
+
+	def appendNode(self, nodes, label):
+		"""Append the index of a node to `nodes`, or defer it until the end"""
+		try:
+			nodes.append(self.nodeIds[label])
+		except KeyError:
+			self.pending.append((nodes, len(nodes), label))
+			nodes.append(-1)
+
+	def build(self):
+		"""The structure described by the file, with its loading as `loading`"""
+		from StructPy import cross_sections as xs
+		from StructPy import materials as ma
+
+		cross = xs.generalSection(**self.sections.get('XSection', {}))
+		material = ma.Custom(**self.sections.get('Material', {}))
+		s1 = self.StructureType(cross=cross, material=material)
+		s1.config = self.sections.get('Config', {})
+
+		for nodes, i, label in self.pending:
+			try:
+				nodes[i] = self.nodeIds[label]
+			except KeyError:
+				raise ValueError(f'Node {label} is not defined.')
+
+		codes = np.array([s1.nodes.fixityCode(name) for name in self.fixityNames], dtype=np.int8)
+		fixity = codes[np.frombuffer(self.fixity, dtype=np.int8)] if len(self.x) else 'free'
+		s1.addNodes(np.frombuffer(self.x), np.frombuffer(self.y), fixity=fixity)
+
+		s1.addMembers(np.frombuffer(self.SN, dtype=np.int64), np.frombuffer(self.EN, dtype=np.int64),
+			expectedaxial=np.frombuffer(self.axial))
+
+		nodes = np.frombuffer(self.loadNode, dtype=np.int64)
+		DoF = s1.nDoFPerNode*nodes + np.frombuffer(self.loadDoF, dtype=np.int64)
+		s1.loading = np.bincount(DoF, weights=np.frombuffer(self.loadValues), minlength=s1.nDoF)
+		return s1
+
+
+def read(StructureType, filePath):
+	"""Read a Truss or Frame from a YAML model file"""
+	with open(filePath, 'r') as stream:
+		return ModelReader(StructureType).read(stream).build()
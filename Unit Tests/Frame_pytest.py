@@ -4,7 +4,7 @@ This is the StructPy Frame testing suite. This uses pytest and logs information
 There are several example frames in .yaml files. These are file formatted to store structure information. They are used for the purpose of easily testing many known solutions.
 """
 
-from pytest import approx
+from pytest import approx, raises
 import yaml
 import logging
 
@@ -73,4 +73,254 @@ def test_6_2_5():
 	assert f1.nodes[1].deformation_dict['x'] == 0
 	assert approx(f1.nodes[2].deformation_dict['θz'], 0.01) == 6.92851 * 10**(-5)
 	assert approx(f1.nodes[1].deformation_dict['θz'], 0.01) == -2.63092*10**(-5)
-	
\ No newline at end of file
+	
+def test_sparse_6_2_5():
+	"""Sparse assembly matches the dense path"""
+	xs1 = xs.generalSection(A=0.01, Ix=0.0001)
+	ma1 = ma.Custom(E=2*10**11)
+	loading = np.array([0, -2000, -666.6666667,
+						0, -5000,  -833.3333333333333333333333333,
+						0, -3000, 1500])
+	
+	frames = []
+	for sparse in [False, True]:
+		f1 = Frame.Frame(cross=xs1, material=ma1, sparse=sparse)
+		f1.addNode(0, 0, fixity='fixed')
+		f1.addNode(2, 0, fixity='roller')
+		f1.addNode(5, 0, fixity='roller')
+		f1.addMember(0, 1)
+		f1.addMember(1, 2)
+		frames.append(f1)
+	
+	dense, sparse = frames
+	assert np.allclose(sparse.K.toarray(), dense.K)
+	assert np.allclose(sparse.reducedK.toarray(), dense.reducedK)
+	assert np.allclose(sparse.directStiffness(loading), dense.directStiffness(loading))
+
+def test_stackedKglobal():
+	"""The batched element engine matches the per-member matrices"""
+	xs1 = xs.generalSection(A=3, Ix=7)
+	ma1 = ma.Custom(E=5)
+	f1 = Frame.Frame(cross=xs1, material=ma1)
+	f1.addNode(0, 0, fixity='fixed')
+	f1.addNode(3, 4)
+	f1.addNode(10, -2)
+	f1.addMember(0, 1)
+	f1.addMember(1, 2)
+	f1.addMember(2, 0)
+	
+	assert f1.kglobals.shape == (3, 6, 6)
+	for member, k in zip(f1.members, f1.kglobals):
+		assert np.allclose(member.kglobal, k)
+
+def test_population():
+	"""A population of designs is solved in one batched evaluation"""
+	xs1 = xs.generalSection(A=0.01, Ix=0.0001)
+	ma1 = ma.Custom(E=2*10**11)
+	f1 = Frame.Frame(cross=xs1, material=ma1)
+	f1.addNode(0, 0, fixity='fixed')
+	f1.addNode(3, 0)
+	f1.addNode(3, 4, fixity='pin')
+	f1.addMember(0, 1)
+	f1.addMember(1, 2)
+	loading = np.zeros(9)
+	loading[4] = -1000
+	
+	# 5 candidate rectangular sections, the same for every member
+	family = xs.Rectangle(b=0.1, h=np.linspace(0.1, 0.3, 5)[:, None])
+	D = f1.populationSolve(loading, cross=family)
+	assert D.shape == (5, 9)
+	
+	for h, expected in zip(np.linspace(0.1, 0.3, 5), D):
+		f2 = Frame.Frame(cross=xs.Rectangle(b=0.1, h=h), material=ma1)
+		f2.addNode(0, 0, fixity='fixed')
+		f2.addNode(3, 0)
+		f2.addNode(3, 4, fixity='pin')
+		f2.addMember(0, 1)
+		f2.addMember(1, 2)
+		assert np.allclose(f2.directStiffness(loading), expected)
+
+def test_member_forces():
+	"""Local end forces of a cantilever and equilibrium of every member"""
+	xs1 = xs.generalSection(A=3, Ix=7)
+	ma1 = ma.Custom(E=5000)
+	f1 = Frame.Frame(cross=xs1, material=ma1)
+	f1.addNode(0, 0, fixity='fixed')
+	f1.addNode(0, 4)
+	f1.addNode(3, 8)
+	f1.addMember(0, 1)
+	f1.addMember(1, 2)
+	
+	# a transverse tip load on the inclined member
+	P = 10
+	loading = np.zeros(9)
+	loading[6:8] = P * np.array([-4, 3]) / 5
+	f1.directStiffness(loading)
+	
+	forces = f1.memberForces()
+	assert forces.shape == (2, 6)
+	N1, V1, M1, N2, V2, M2 = forces[1]
+	assert (N1, V1, M1, N2, V2, M2) == approx((0, -P, -5*P, 0, P, 0), abs=1e-9)
+	
+	# T^T f of all members sums to K d
+	k, T = Frame.FrameMember.stackedLocal(f1.memberVectors, 3, 5000, 7)
+	internal = np.bincount(f1.DoFMap.ravel(), weights=np.einsum('mji,mj->mi', T, forces).ravel(), minlength=9)
+	assert np.allclose(internal, f1.K @ f1.solve(loading))
+	
+	# several load cases at once
+	D = f1.directStiffness(np.column_stack([loading, 2*loading]))
+	assert np.allclose(f1.memberForces(D)[..., 1], 2*forces)
+
+def test_element_loads():
+	"""A uniform load on an inclined cantilever gives the statical reactions"""
+	from StructPy.Loads import Loading
+	xs1 = xs.generalSection(A=3, Ix=7)
+	ma1 = ma.Custom(E=5000)
+	f1 = Frame.Frame(cross=xs1, material=ma1)
+	f1.addNode(0, 0, fixity='fixed')
+	f1.addNode(3, 4)
+	f1.addMember(0, 1)
+	
+	w, L = -2, 5
+	gravity = Loading()
+	gravity.addElementLoad(0, w=w, isGlobal=True)
+	f1.directStiffness(gravity.vector(f1))
+	Rx, Ry, M = f1.nodes[0].reaction
+	assert (Rx, Ry, M) == approx((0, -w*L, -w*L*3/2))
+	
+	# perpendicular load: the end moment of the fixed-end forces carries over
+	transverse = Loading()
+	transverse.addElementLoad(0, w=w)
+	f1.directStiffness(transverse.vector(f1))
+	assert f1.nodes[0].reaction[2] == approx(-w*L**2/2)
+	assert np.hypot(*f1.nodes[0].reaction[:2]) == approx(abs(w)*L)
+	# the member carries the whole load to the support
+	forces = f1.memberForces(fixedEnd=transverse.fixedEndForces(f1))
+	assert forces[0, [1, 2, 4, 5]] == approx([-w*L, -w*L**2/2, 0, 0], abs=1e-9)
+
+def test_element_load_forces():
+	"""End forces of a fixed-fixed beam under a uniform load, as two elements"""
+	from StructPy.Loads import LoadCases, Combinations
+	f1 = Frame.Frame(cross=xs.generalSection(A=3, Ix=7), material=ma.Custom(E=5000))
+	f1.addNodes([0, 5, 10], 0, fixity=['fixed', 'free', 'fixed'])
+	f1.addMembers([0, 1], [1, 2])
+	
+	w, L = -2, 10
+	cases = LoadCases()
+	cases.add('D').addElementLoad(0, w=w)
+	cases['D'].addElementLoad(1, w=w)
+	cases.add('L').addNodalLoad(1, y=-4)
+	cases.solve(f1)
+	forces = cases.memberForces(f1)
+	assert forces.shape == (2, 6, 2)
+	# fixed end: wL/2 and wL^2/12, midspan: wL^2/24 of sagging moment
+	assert forces[0, :, 0] == approx([0, -w*L/2, -w*L**2/12, 0, 0, -w*L**2/24], abs=1e-9)
+	assert forces[1, :, 0] == approx([0, 0, w*L**2/24, 0, -w*L/2, w*L**2/12], abs=1e-9)
+	
+	combinations = Combinations.fromRules(cases.names)
+	envelope = combinations.envelope(forces)
+	assert envelope['max'][0, 2] == approx(1.2*-w*L**2/12 + 1.6*4*L/8)
+
+E, A, I, L = 29000, 10, 100, 120  # the cantilever of `make_cantilever`
+
+def make_cantilever(nElements=10, sparse=False, rho=None):
+	"""A vertical cantilever of length L, fixed at node 0, in nElements elements"""
+	f1 = Frame.Frame(cross=xs.generalSection(A=A, Ix=I), material=ma.Custom(E=E, massDensity=rho), sparse=sparse)
+	f1.addNodes(0, np.linspace(0, L, nElements + 1), fixity=['fixed'] + ['free']*nElements)
+	f1.addMembers(np.arange(nElements), np.arange(1, nElements + 1))
+	return f1
+
+def test_buckling():
+	"""Euler loads of a cantilever and a pinned column"""
+	nElements = 10
+	for sparse in [False, True]:
+		f1 = make_cantilever(nElements, sparse=sparse)
+		loading = np.zeros(f1.nDoF)
+		loading[-2] = -1
+		
+		factors, modes = f1.buckling(loading, nModes=2)
+		Pcr = np.pi**2*E*I/(2*L)**2
+		assert factors[0] == approx(Pcr, rel=1e-4)
+		assert factors[1] == approx(9*Pcr, rel=1e-3)
+		assert modes.shape == (f1.nDoF, 2)
+		assert abs(modes[-3, 0]) == approx(1)  # the tip sways most
+	
+	# pinned at both ends
+	f1.nodes[0].fixity = 'pin'
+	f1.nodes[nElements].fixity = 'yroller'
+	factors, modes = f1.buckling(loading)
+	assert factors[0] == approx(np.pi**2*E*I/L**2, rel=1e-4)
+
+def test_modes():
+	"""Natural frequencies of a cantilever against beam theory"""
+	rho = 7.3e-7
+	f1 = make_cantilever(20, sparse=True, rho=rho)
+	
+	M = f1.mass()
+	assert isSymmetric(M.toarray())
+	assert M.toarray()[0::3, 0::3].sum() == approx(rho*A*L)
+	
+	frequencies, shapes, participation = f1.modes(2)
+	beam = np.sqrt(E*I/(rho*A*L**4))/(2*np.pi)
+	assert frequencies == approx(beam*np.array([1.875104, 4.694091])**2, rel=1e-4)
+	assert shapes.shape == (f1.nDoF, 2)
+	# 61.3% of the mass takes part in the first sway mode
+	assert participation[0, 0]**2 == approx(0.6131*rho*A*L, rel=1e-3)
+	assert participation[:, 1] == approx(0, abs=1e-9)
+	
+	lumped, _, _ = f1.modes(1, lumped=True)
+	assert lumped[0] == approx(frequencies[0], rel=1e-2)
+	
+	# shipped steels give their weight density; the mass follows from g
+	for member in f1.members:
+		member.material = ma.A992()
+	steel, _, _ = f1.modes(1)
+	rho = ma.A992.density/1000/386.4
+	assert steel[0] == approx(1.875104**2*np.sqrt(E*I/(rho*A*L**4))/(2*np.pi), rel=1e-4)
+	assert steel[0] == approx(24.4, rel=1e-2)
+
+def test_time_history(tmp_path):
+	"""A suddenly applied tip load on a cantilever"""
+	nElements = 20
+	f1 = make_cantilever(nElements, sparse=True, rho=7.3e-7)
+	loading = np.zeros(f1.nDoF)
+	loading[-3] = 1
+	static = f1.solve(loading)[-3]
+	dt = 1/f1.modes(1)[0][0]/200
+	
+	# undamped, the tip swings between rest and twice the static deflection
+	time, D, forces = f1.timeHistory(dt, loading, np.ones(2001), damping=0)
+	assert time[-1] == approx(2000*dt)
+	assert D[:, -3].max() == approx(2*static, rel=1e-2)
+	assert D[:, -3].min() == approx(0, abs=1e-3*static)
+	assert forces.shape == (2001, nElements, 6)
+	
+	# damped, it settles at the static deflection; results go to disk
+	time, D, forces = f1.timeHistory(dt, loading, np.ones(4001), damping=0.1, decimation=10, output=tmp_path)
+	assert D.shape == (401, f1.nDoF)
+	assert D[-1, -3] == approx(static, rel=1e-2)
+	assert forces[-1, 0, 2] == approx(L, rel=1e-2)  # fixed end moment of the static load
+	assert np.load(tmp_path/'displacements.npy', mmap_mode='r')[-1] == approx(D[-1])
+
+def test_second_order():
+	"""P-Δ deflection of a beam-column against the exact solution"""
+	nElements = 10
+	for sparse in [False, True]:
+		f1 = make_cantilever(nElements, sparse=sparse)
+		P = 0.5*np.pi**2*E*I/(2*L)**2
+		k = np.sqrt(P/(E*I))
+		loading = np.zeros(f1.nDoF)
+		loading[-2] = -P
+		loading[-3] = 1
+		
+		D = f1.secondOrder(loading, nSteps=2)
+		assert D[-3] == approx((np.tan(k*L) - k*L)/(P*k), rel=1e-5)
+		assert f1.nodes[nElements].deformation == approx(D[-3:])
+		info = f1.nonlinearInfo
+		assert [i['step'] for i in info if i['residual'] < 1e-8] == [1, 2]
+		assert all(i['factorize'] >= 0 and i['assemble'] > 0 for i in info)
+	
+	# beyond the buckling load there is no equilibrium to converge to
+	loading[-2] = -2.5*P
+	with raises(sc.UnstableStructureError):
+		f1.secondOrder(loading, nSteps=1)
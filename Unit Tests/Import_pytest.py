@@ -0,0 +1,54 @@
+"""
+Import-time benchmark for StructPy. Batch workers start many short-lived processes, so `import StructPy.Truss` / `StructPy.Frame` must stay cheap:
+
+* plotting (matplotlib), spreadsheet (openpyxl), YAML (pyyaml) and scipy are only imported when a method that needs them is called
+* StructPy's own modules, excluding numpy, must import within `BUDGET_MS`
+
+The first is always checked. Wall-clock times depend on the machine and its
+load, so the budget is only checked when the environment variable
+`STRUCTPY_BENCHMARK` is set. Run this file directly to print the measurement.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+BUDGET_MS = 60
+LAZY_MODULES = ['matplotlib', 'openpyxl', 'yaml', 'scipy']
+
+def importTime(statement='import StructPy.Truss, StructPy.Frame'):
+	"""
+	Run `statement` in a fresh interpreter with `python -X importtime`.
+	Returns the time in ms spent importing StructPy and the part of it spent
+	in numpy, plus the top-level packages that ended up imported.
+	"""
+	check = f'{statement}; import sys; print(",".join(sorted(m for m in sys.modules if "." not in m)))'
+	result = subprocess.run([sys.executable, '-X', 'importtime', '-c', check],
+		capture_output=True, text=True, check=True)
+	
+	total = numpy = 0
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		selfTime, cumulative, name = line[len('import time:'):].split('|')
+		if name.strip().startswith('StructPy') and not name.startswith('  '):
+			total += int(cumulative) / 1000  # top level: indentation is one space
+		elif name.strip() == 'numpy':
+			numpy = int(cumulative) / 1000
+	return total, numpy, result.stdout.strip().split(',')
+
+def test_lazy_imports():
+	total, numpy, modules = importTime()
+	assert not set(LAZY_MODULES) & set(modules)
+
+@pytest.mark.skipif(not os.environ.get('STRUCTPY_BENCHMARK'), reason='set STRUCTPY_BENCHMARK to check the import time')
+def test_import_budget():
+	total, numpy, modules = importTime()
+	assert total - numpy < BUDGET_MS
+
+if __name__ == '__main__':
+	total, numpy, modules = importTime()
+	print(f'StructPy: {total:.1f} ms, of which numpy: {numpy:.1f} ms')
+	print(f'StructPy excluding numpy: {total - numpy:.1f} ms, budget {BUDGET_MS} ms')
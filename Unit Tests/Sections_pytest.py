@@ -0,0 +1,106 @@
+"""
+StructPy cross section testing suite. All functions beginning with `test_` are run by pytest.
+"""
+
+from pytest import approx, raises
+import numpy as np
+
+import StructPy.cross_sections as xs
+import StructPy.shapes as shapes
+
+def test_AISC():
+	xs1 = xs.AISC('W21X44')
+	assert xs1.A == 13
+	assert xs1.name == 'W21X44'
+	assert xs1['bf/2tf'] == 7.22
+	
+	# names are matched exactly, not by substring
+	assert xs.AISC('W8X48').name == 'W8X48'
+	assert xs.AISC('w21 x 44').row_number == xs1.row_number
+	assert xs.AISC('HSS24X12X.750').name == 'HSS24X12X3/4'
+	with raises(ValueError):
+		xs.AISC('W8X4')
+	
+	# every section shares one catalog and may override its properties
+	xs2 = xs.AISC('C15X33.9')
+	assert xs2.data is xs1.data
+	xs2.A = 3
+	assert xs2.A == 3
+	assert xs.AISC('C15X33.9').A == 10
+
+def test_shapes_database():
+	"""The compiled database is memory-mapped and typed"""
+	catalog = shapes.catalog()
+	assert isinstance(catalog.table, np.memmap)
+	assert len(catalog) == 2091
+	
+	W = xs.AISC('W44X335')
+	assert np.isnan(W.OD)
+	assert W.Type == 'W'
+	assert catalog.table['Ix'].dtype == float
+
+def test_shape_queries():
+	"""Range queries agree with a brute force scan of the catalog"""
+	table = shapes.catalog().table
+	fits = (table['Type'] == 'W') & (table['Zx'] >= 120) & (table['ry'] >= 2.0) & (table['d'] <= 18)
+	expected = sorted(np.flatnonzero(fits), key=lambda row: table['W'][row])
+	
+	found = xs.AISC.query('W', Zx=120, ry=(2.0, None), d=(None, 18))
+	assert [shape.row_number for shape in found] == expected
+	assert xs.AISC.lightest('W', Zx=120, ry=2.0, d=(None, 18)).name == found[0].name
+	assert xs.AISC.lightest('W', Zx=1e6) is None
+	
+	# one query per member
+	Zx = np.array([50, 120, 1e6])
+	lightest = xs.AISC.lightest('W', Zx=Zx, ry=2.0)
+	assert [shape.name for shape in lightest[:2]] == [xs.AISC.lightest('W', Zx=z, ry=2.0).name for z in Zx[:2]]
+	assert lightest[2] is None
+
+def test_section_families():
+	"""Array dimensions evaluate a whole family of sections at once"""
+	b = np.array([1, 2, 3])
+	d = np.array([[10.], [12.]])
+	family = xs.IBeam(b, d, 0.1, 0.2)
+	
+	assert family.A.shape == (2, 3)
+	for i in range(2):
+		for j in range(3):
+			single = xs.IBeam(b[j], d[i, 0], 0.1, 0.2)
+			assert family.A[i, j] == approx(single.A)
+			assert family.Ix[i, j] == approx(single.Ix)
+			assert family.Sx[i, j] == approx(single.Ix / (d[i, 0]/2 + 0.2))
+			assert family.rx[i, j] == approx(single.rx)
+	
+	for section in [xs.Rectangle(b, 2), xs.Circle(b), xs.hollowCircle(b, b/2), xs.HSS(b + 1, b, b + 1, b)]:
+		assert section.A.shape == (3,)
+		assert section.Ix.shape == (3,)
+
+def test_custom_section():
+	"""Polygon properties agree with the closed-form sections"""
+	beam = xs.IBeam(6, 10, 0.5, 1)
+	custom = xs.customSection(beam.xpts, beam.ypts)
+	assert custom.A == approx(beam.A)
+	assert custom.ybar == approx(6)
+	assert custom.Ix == approx(beam.Ix)
+	assert custom.Iy == approx(beam.Iy)
+	assert custom.Sx == approx(beam.Sx)
+	zeta = np.array([0, 2, 5])
+	assert custom.Q(zeta) == approx(beam.Q(zeta))
+	
+	# a hole, given clockwise
+	tube = xs.customSection([0, 4, 4, 0], [0, 0, 6, 6], holes=[([1, 1, 3, 3], [1, 5, 5, 1])])
+	hss = xs.HSS(6, 4, 4, 2)
+	assert (tube.A, tube.Ix, tube.Iy) == approx((hss.A, hss.Ix, hss.Iy))
+	
+	# principal axes of a rotated rectangle
+	c, s = np.cos(0.3), np.sin(0.3)
+	x, y = np.array([0, 2, 2, 0]), np.array([0, 0, 1, 1])
+	rotated = xs.customSection(c*x - s*y, s*x + c*y)
+	I1, I2, theta = rotated.principal
+	assert (I1, I2) == approx((8/12, 2/12))
+	assert np.tan(theta) == approx(np.tan(0.3 + np.pi/2))
+	
+	# a batch of outlines at once, padded to the same vertex count
+	X = np.array([[0, 2, 2, 0, 0], [0, 4, 4, 0, 0]], dtype=float)
+	Y = np.array([[0, 0, 1, 1, 1], [0, 0, 1, 1, 1]], dtype=float)
+	assert xs.polygonProperties(X, Y)['A'] == approx([2, 4])
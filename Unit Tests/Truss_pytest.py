@@ -4,7 +4,7 @@ This is the StructPy Truss testing suite. This uses pytest and logs information
 There are several example trusses in .yaml files. These are file formatted to store structure information. They are used for the purpose of easily testing many known solutions.
 """
 
-from pytest import approx
+from pytest import approx, raises
 import yaml
 import logging
 
@@ -75,6 +75,7 @@ def Truss_Test_From_File(fileName):
 	
 	s2 = Truss.Truss.from_yaml_file(fileName)
 	loading = loading_from_yaml(fileName)
+	assert np.array_equal(s2.loading, loading)
 	s2.directStiffness(loading)
         
 	for i, member in enumerate(s2.members):
@@ -88,4 +89,383 @@ def test_2_7_2():
 	Truss_Test_From_File('Unit Tests/Ex_2.7.2.yaml')
 
 def test_6_2_4():
-	Truss_Test_From_File('Unit Tests/Ex_6.2.4.yaml')
\ No newline at end of file
+	Truss_Test_From_File('Unit Tests/Ex_6.2.4.yaml')
+
+def test_tables():
+	"""Nodes and members are slotted views onto the struct-of-arrays tables"""
+	s1, xs1 = make_structure()
+	
+	assert not hasattr(s1.nodes[0], '__dict__')
+	assert not hasattr(s1.members[0], '__dict__')
+	assert s1.coordinates.shape == (3, 2)
+	assert (s1.DoFMap[1] == [2, 3, 4, 5]).all()
+	assert (s1.members[1].DoF == s1.DoFMap[1]).all()
+	assert s1.members.sections == [xs1]
+	assert s1.members[2].SN.n == 2
+	
+	# views write through to the table
+	s1.nodes[1].x = 3
+	assert s1.coordinates[1, 0] == 3
+	assert s1.members[0].vector[0] == 3
+
+def test_multiple_load_cases():
+	"""All columns of a load matrix are solved with one cached factorization"""
+	s1, xs1 = make_structure()
+	cases = np.array([
+		[0, 0, 100, 100, 0, 0],
+		[0, 0, -50, 25, 0, 0],
+	]).T
+	
+	D = s1.directStiffness(cases)
+	factorization = s1.factorization
+	
+	assert D.shape == (6, 2)
+	for i in range(2):
+		assert np.allclose(s1.solve(cases[:, i]), D[:, i])
+	assert s1.factorization is factorization
+	assert s1.members[0].axial.shape == (2,)
+	
+	# modifying the structure invalidates the factorization
+	s1.addNode(3, 1)
+	s1.addMember(2, 3)
+	s1.addMember(1, 3)
+	assert s1.factorization is not factorization
+
+
+def test_mechanism():
+	"""A square truss without a diagonal is reported as a racking mechanism"""
+	xs1 = xs.generalSection(A=1)
+	ma1 = ma.Custom(E=29000)
+	for sparse in [False, True]:
+		s1 = Truss.Truss(cross=xs1, material=ma1, sparse=sparse)
+		s1.addNode(0, 0, fixity='pin')
+		s1.addNode(10, 0, fixity='roller')
+		s1.addNode(10, 10)
+		s1.addNode(0, 10)
+		s1.addMember(0, 1)
+		s1.addMember(1, 2)
+		s1.addMember(2, 3)
+		s1.addMember(3, 0)
+		
+		with raises(sc.UnstableStructureError) as error:
+			s1.isStable()
+		assert list(error.value.DoF) == [6]
+		assert 'node 3 (x)' in str(error.value)
+		
+		s1.addMember(0, 2)
+		s1.isStable()
+	
+	# with unit geometry and stiffness K is exactly singular, which SuperLU
+	# refuses to factorize; the mechanism is still located on every path
+	for sparse, renumber in [(False, None), (True, None), (False, 'rcm'), (True, 'rcm')]:
+		s1 = Truss.Truss(cross=xs.generalSection(A=1), material=ma.Custom(E=1), sparse=sparse, renumber=renumber)
+		s1.addNodes([0, 1, 1, 0], [0, 0, 1, 1], fixity=['pin', 'roller', 'free', 'free'])
+		s1.addMembers([0, 1, 2, 3], [1, 2, 3, 0])
+		
+		with raises(sc.UnstableStructureError) as error:
+			s1.isStable()
+		assert set(error.value.DoF) <= {4, 6}  # the nodes sway in x
+		assert len(error.value.DoF) and ' (x)' in str(error.value)
+		with raises(sc.UnstableStructureError):
+			s1.secondOrder(np.ones(s1.nDoF))
+
+def make_pratt(nPanels, sparse=False, renumber=None):
+	"""A Pratt truss whose nodes are added in a scrambled order"""
+	xs1 = xs.generalSection(A=2)
+	ma1 = ma.Custom(E=29000)
+	s1 = Truss.Truss(cross=xs1, material=ma1, sparse=sparse, renumber=renumber)
+	
+	order = np.random.RandomState(0).permutation(2*(nPanels + 1))
+	position = np.argsort(order)  # node number of each (panel, chord) point
+	for point in order:
+		panel, top = divmod(point, 2)
+		fixity = 'free'
+		if not top and panel == 0:
+			fixity = 'pin'
+		elif not top and panel == nPanels:
+			fixity = 'roller'
+		s1.addNode(10*panel, 10*top, fixity=fixity)
+	
+	node = lambda panel, top: position[2*panel + top]
+	for panel in range(nPanels):
+		s1.addMember(node(panel, 0), node(panel + 1, 0))
+		s1.addMember(node(panel, 1), node(panel + 1, 1))
+		s1.addMember(node(panel, 0), node(panel + 1, 1))
+	for panel in range(nPanels + 1):
+		s1.addMember(node(panel, 0), node(panel, 1))
+	
+	loading = np.zeros(s1.nDoF)
+	loading[1::2] = -1
+	return s1, loading
+
+def test_hanging_mechanism():
+	"""
+	An unbraced panel hung below a stable truss is reported at its own nodes
+	by every solver path. Its DoFs keep stiffness on the diagonal, so only
+	pivots mapped to the right DoFs find it.
+	"""
+	for sparse, renumber in [(False, None), (True, None), (False, 'rcm'), (True, 'rcm')]:
+		s1, loading = make_pratt(8, sparse=sparse, renumber=renumber)
+		a, b = [n.n for n in s1.nodes if n.y == 0 and n.x in (30, 40)]
+		s1.addNode(30, -10)
+		s1.addNode(40, -10)
+		s1.addMember(a, 18)
+		s1.addMember(b, 19)
+		s1.addMember(18, 19)
+		
+		with raises(sc.UnstableStructureError) as error:
+			s1.isStable()
+		assert set(np.asarray(error.value.DoF) // 2) <= {18, 19}
+		assert 'x)' in str(error.value)
+
+def test_renumbering():
+	"""Reverse Cuthill-McKee renumbering does not change the results"""
+	s1, loading = make_pratt(20)
+	expected = s1.directStiffness(loading)
+	for sparse in [False, True]:
+		s2, loading = make_pratt(20, sparse=sparse, renumber='rcm')
+		assert np.allclose(s2.directStiffness(loading), expected)
+	
+	# the renumbered matrix is banded
+	order = s2.DoFOrder
+	K = s1.reducedK
+	assert sc.bandwidth(K[np.ix_(order, order)]) < sc.bandwidth(K) / 4
+
+def test_pcg():
+	"""The iterative solver agrees with the direct solve"""
+	s1, loading = make_pratt(20, sparse=True)
+	expected = s1.solve(loading)
+	
+	for options in [{}, {'preconditioner': 'ic'}, {'matrixFree': True}]:
+		D = s1.directStiffness(loading, solver='pcg', tol=1e-12, **options)
+		assert s1.solverInfo[0]['converged']
+		assert np.allclose(D, expected)
+	
+	# warm-starting from the solution needs no iterations
+	s1.solve(loading, solver='pcg', tol=1e-6, x0=expected)
+	assert s1.solverInfo[0]['iterations'] == 0
+
+def test_cache():
+	"""Cached quantities are recomputed only when their inputs change"""
+	s1, xs1 = make_structure()
+	K = s1.K
+	assert s1.K is K
+	assert s1.cache.stats['hits'] > 0
+	
+	# editing a node, a section or a material makes K stale
+	s1.nodes[1].y = 2
+	assert s1.K is not K
+	assert np.allclose(s1.K, s1.K.T)
+	K = s1.K
+	xs1.b = 3
+	assert s1.K is not K
+	assert np.allclose(1.5*K, s1.K)
+	K = s1.K
+	s1.members[0].material.E = 2*s1.members[0].material.E
+	assert s1.K is not K
+	
+	# the factorization is reused while K is valid
+	factorization = s1.factorization
+	s1.solve(np.array([0, 0, 100, 100, 0, 0]))
+	assert s1.factorization is factorization
+	
+	# a memory cap evicts the least recently used entries
+	s1.cache.maxBytes = 1
+	s1.nodes[1].y = 1
+	s1.factorization
+	assert s1.cache.stats['evictions'] > 0
+	assert s1.cache.stats['entries'] == 1
+
+def test_bulk_construction():
+	"""addNodes/addMembers build the same structure as adding one at a time"""
+	s1, loading = make_pratt(6)
+	
+	s2 = Truss.Truss(cross=s1.defaultcross, material=s1.defaultmaterial)
+	fixity = np.array(s1.nodes.fixityNames)[s1.nodes.fixity]
+	s2.addNodes(s1.coordinates[:, 0], s1.coordinates[:, 1], fixity=fixity)
+	assert len(set(s2.nodes.epochs.values())) == 1  # one invalidation per batch
+	s2.addMembers(*s1.connectivity.T)
+	
+	assert np.allclose(s2.K, s1.K)
+	assert np.allclose(s2.directStiffness(loading), s1.directStiffness(loading))
+	
+	# invalid batches are rejected as a whole
+	with raises(IndexError):
+		s2.addMembers([0, 1], [2, s2.nNodes])
+	with raises(ValueError, match='duplicate'):
+		s2.addMembers(*s1.connectivity[:1].T[::-1])
+	s2.addNodes(*s2.coordinates[0])
+	with raises(ValueError, match='zero length'):
+		s2.addMembers([0], [s2.nNodes - 1])
+	assert s2.nMembers == s1.nMembers
+
+def test_streaming_yaml(tmp_path):
+	"""The YAML reader accepts sections in any order and mapping style entries"""
+	path = tmp_path / 'model.yaml'
+	path.write_text('''
+Members:
+    A,B: {axial: 1.5}
+    B,C: {}
+Loads:
+    - B: {y: -10}
+Nodes:
+    A: {x: 0, y: 0, fixity: pin}
+    B: {x: 3, y: 4}
+    C: {x: 6, y: 0, fixity: pin}
+Material: {E: 29000}
+XSection: {A: 2}
+''')
+	s1 = Truss.Truss.from_yaml_file(path)
+	assert s1.nNodes == 3 and s1.nMembers == 2
+	assert (s1.connectivity == [[0, 1], [1, 2]]).all()
+	assert s1.members[0].expectedaxial == 1.5 and s1.members[1].expectedaxial is None
+	assert s1.defaultmaterial.E == 29000
+	assert (s1.loading == [0, 0, 0, -10, 0, 0]).all()
+	s1.directStiffness(s1.loading)
+	assert s1.members[0].axial == approx(s1.members[1].axial)
+	
+	path.write_text('Nodes:\n    - A: {x: 0, y: 0}\nMembers:\n    - A,Z: {}\n')
+	with raises(ValueError, match='Z'):
+		Truss.Truss.from_yaml_file(path)
+
+def test_save_load(tmp_path):
+	"""A saved structure reopens with its results and factorization"""
+	for sparse, renumber in [(False, None), (False, 'rcm'), (True, None)]:
+		s1, loading = make_pratt(8, sparse=sparse, renumber=renumber)
+		D = s1.directStiffness(loading)
+		s1.save(tmp_path / 'pratt.npz')
+		
+		s2 = Truss.Truss.load(tmp_path / 'pratt.npz')
+		assert isinstance(s2, Truss.Truss)
+		assert (s2.connectivity == s1.connectivity).all()
+		assert np.array_equal(s2.nodes.deformation, s1.nodes.deformation)
+		assert s2.members[3].axial == approx(s1.members[3].axial)
+		
+		misses = s2.cache.misses
+		assert np.allclose(s2.solve(2*loading), 2*D)
+		assert s2.cache.misses == misses  # K and its factorization came from the file
+		
+		# the reopened model can still be edited
+		s2.nodes[5].x += 1
+		assert not np.allclose(s2.directStiffness(loading), D)
+
+def test_member_forces():
+	"""Axial forces of all members at once match the per-member values"""
+	s1, loading = make_pratt(5)
+	s1.directStiffness(loading)
+	axial = s1.memberForces()
+	assert axial.shape == (s1.nMembers,)
+	assert axial == approx([member.axial for member in s1.members])
+	
+	s1.directStiffness(np.column_stack([loading, -loading]))
+	assert s1.memberForces() == approx(np.column_stack([axial, -axial]))
+
+def test_reactions():
+	"""Reactions balance the loads and the residual measures the solution error"""
+	for sparse in [False, True]:
+		s1, loading = make_pratt(6, sparse=sparse)
+		s1.directStiffness(loading)
+		
+		assert (s1.reactions[s1.freeDoF] == 0).all()
+		assert s1.reactions[0::2].sum() == approx(-loading[0::2].sum(), abs=1e-9)
+		assert s1.reactions[1::2].sum() == approx(-loading[1::2].sum())
+		assert s1.residual < 1e-9 * np.linalg.norm(loading)
+		pin = np.flatnonzero(s1.nodes.fixity == s1.nodes.fixityCode('pin'))[0]
+		assert (s1.nodes[pin].reaction == s1.reactions[2*pin:2*pin + 2]).all()
+	
+	# an unconverged iterative solve shows up in the residual, one value per case
+	s1.directStiffness(np.column_stack([loading, 2*loading]), solver='pcg', maxiter=3, matrixFree=True)
+	assert s1.residual.shape == (2,)
+	assert (s1.residual > 1e-9 * np.linalg.norm(loading)).all()
+
+def test_load_combinations():
+	"""Combinations of the case results match solving the combined loads"""
+	from StructPy.Loads import LoadCases, Combinations
+	s1, loading = make_pratt(4)
+	top = np.flatnonzero(s1.coordinates[:, 1] == 10)
+	
+	cases = LoadCases()
+	dead = cases.add('D')
+	for node in top:
+		dead.addNodalLoad(node, y=-1)
+	cases.add('L').addNodalLoad(top[0], y=-3)
+	cases.add('W').addNodalLoad(top[0], x=2)
+	
+	F = cases.matrix(s1)
+	assert F.shape == (s1.nDoF, 3) and F.nnz == len(top) + 2
+	D = cases.solve(s1)
+	
+	combinations = Combinations.fromRules(cases.names)
+	assert '1.2D + 1.6L' in combinations.names
+	assert len(set(combinations.names)) == len(combinations)
+	combined = combinations.combine(D)
+	for i, coefficients in enumerate(combinations.coefficients):
+		assert np.allclose(combined[:, i], s1.solve(F @ coefficients))
+	
+	forces = s1.memberForces(D)
+	envelope = combinations.envelope(forces)
+	bruteForce = combinations.combine(forces)
+	assert (envelope['max'] == bruteForce.max(axis=1)).all()
+	assert (envelope['min'] == bruteForce.min(axis=1)).all()
+	assert (bruteForce[np.arange(s1.nMembers), envelope['maxCombination']] == envelope['max']).all()
+	
+	# loads a truss cannot take are refused rather than dropped
+	with raises(ValueError):
+		cases['D'].addNodalLoad(top[0], x=1, isGlobal=False)
+	cases['D'].addNodalLoad(top[0], m=5)
+	with raises(ValueError):
+		cases.matrix(s1)
+
+def test_influence_lines():
+	"""Influence lines from one multi-RHS solve and moving load envelopes"""
+	s1, loading = make_pratt(6)
+	bottom = np.flatnonzero(s1.coordinates[:, 1] == 0)
+	bottom = bottom[np.argsort(s1.coordinates[bottom, 0])]
+	pin = bottom[0]
+	# the bottom chord, with a point a quarter along its first member
+	first = np.flatnonzero(np.sort(s1.connectivity, axis=1) == np.sort(bottom[:2]))[0] // 2
+	fraction = 0.25 if s1.connectivity[first, 0] == bottom[0] else 0.75
+	path = [bottom[0], (first, fraction)] + list(bottom[1:])
+	
+	lines = s1.influenceLines(path, members=[0, 5], reactions=[2*pin + 1], displacements=[2*bottom[3] + 1])
+	x = lines.x
+	assert x[:3] == approx([0, 2.5, 10]) and x[-1] == 60
+	assert lines['reactions'][0] == approx(1 - x/60)
+	assert lines['members'].shape == (2, len(path))
+	
+	# every position agrees with a separate solve
+	for i, node in enumerate(bottom):
+		F = np.zeros(s1.nDoF)
+		F[2*node + 1] = -1
+		D = s1.directStiffness(F)
+		j = list(x).index(10*i)
+		assert lines['members'][:, j] == approx(s1.memberForces()[[0, 5]])
+		assert lines['displacements'][0, j] == approx(D[2*bottom[3] + 1])
+	
+	# a two axle train, against a fine brute force sweep
+	loads, offsets = [10, 5], [0, 7]
+	envelope = lines.movingLoad(loads, offsets)
+	lead = np.linspace(0, 67, 6701)
+	swept = lines.sweep(loads, offsets, lead)
+	for name in ['members', 'reactions', 'displacements']:
+		assert (envelope[name]['max'] >= swept[name].max(axis=-1) - 1e-9).all()
+		assert (envelope[name]['min'] <= swept[name].min(axis=-1) + 1e-9).all()
+		assert envelope[name]['max'] == approx(swept[name].max(axis=-1), rel=1e-3)
+	assert envelope['reactions']['max'][0] == approx(10*53/60 + 5)
+	assert envelope['reactions']['maxAt'][0] == approx(7)
+
+def test_buckling():
+	"""A column braced by a spring buckles at P = k L"""
+	s1 = Truss.Truss(cross=xs.generalSection(A=1), material=ma.Custom(E=1000))
+	s1.addNode(0, 0, fixity='pin')
+	s1.addNode(0, 10)
+	s1.addNode(5, 10, fixity='pin')
+	s1.addMember(0, 1)
+	s1.addMember(1, 2)
+	loading = np.array([0, 0, 0, -2, 0, 0])
+	
+	factors, modes = s1.buckling(loading)
+	assert factors[0] == approx(1000/5 * 10 / 2)
+	assert modes[2, 0] == approx(1) or modes[2, 0] == approx(-1)
+	with raises(ValueError):
+		s1.buckling(-loading)
@@ -15,8 +15,10 @@ setup(name='StructPy',
       license='MIT',
       install_requires=[
           'numpy',
+          'scipy',
           'matplotlib'],
       zip_safe=False,
-      packages=packages)
+      packages=packages,
+      package_data={'Resources': ['shapes.npy']})
 
 